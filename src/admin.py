@@ -12,42 +12,54 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import contextlib
+import enum
+import functools
+import json
+import sys
 import uuid
 from typing import Optional, Tuple
 
 import typer
-from argon2 import PasswordHasher
 from rich import print
-from rich.prompt import Prompt
-from rich.table import Table
-from sqlalchemy import not_
 
-from api.v1 import schemas
-from datastores.sql import database
-from datastores.sql.crud.user import (
-    create_user_in_db,
-    get_user_by_username_from_db,
-    get_users_from_db,
-)
+# Database, model, hashing and table rendering modules are imported inside the
+# commands that use them. Importing SQLAlchemy and all models dominates the CLI
+# startup time, and is not needed for e.g. --help or tune_argon2.
 
-# Import models to make the ORM register correctly.
-from datastores.sql.models import file, folder, user, workflow
-from datastores.sql.models.role import Role
-from datastores.sql.models.user import UserRole
+# Number of users fetched per round trip when listing users.
+LIST_USERS_BATCH_SIZE = 500
 
-from datastores.sql.models.file import File
-from datastores.sql.models.folder import Folder
+app = typer.Typer()
 
 
-password_hasher = PasswordHasher()
+@contextlib.contextmanager
+def db_session():
+    """Yields a database session and closes it when the command is done.
 
-app = typer.Typer()
+    The database layer is imported on first use. The engine and its connection pool
+    are created once per process, so all sessions share the pool.
+    """
+    from datastores.sql import database
+
+    # Import models to make the ORM register correctly.
+    from datastores.sql.models import file, folder, user, workflow
+
+    db = database.SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
 
 
 def get_username_and_password(
     username: Optional[str] = None, password: Optional[str] = None
 ) -> Tuple[str, str]:
     """Prompts the user for username and password, pre-filling if provided."""
+    if username and password:
+        return username, password
+
+    from rich.prompt import Prompt
 
     if username:
         print("[bold blue]Username: [/]", username)
@@ -63,6 +75,16 @@ def get_username_and_password(
     return username, password
 
 
+def _read_stdin_password(username: Optional[str]) -> str:
+    """Reads a password piped to stdin, e.g. from a secret store."""
+    if not username:
+        print(
+            "[bold red]Error: A username is required with --stdin-password.[/bold red]"
+        )
+        raise typer.Exit(code=1)
+    return sys.stdin.read().strip()
+
+
 @app.command()
 def create_user(
     username: Optional[str] = typer.Argument(None, help="Username for the new user."),
@@ -70,32 +92,66 @@ def create_user(
         None, "--password", "-p", help="Password for the new user."
     ),
     admin: bool = typer.Option(False, "--admin", "-a", help="Make the user an admin."),
+    stdin_password: bool = typer.Option(
+        False, "--stdin-password", help="Read the password from stdin."
+    ),
 ):
     """Creates a new user."""
-    db = database.SessionLocal()
+    from datastores.sql.crud.user import (
+        create_user_row_in_db,
+        get_user_by_username_from_db,
+    )
+    from lib.password_hashing import password_hasher
 
-    # Check for existing user *before* potentially prompting
-    if username and get_user_by_username_from_db(db, username):
-        print("[bold red]Error: User already exists.[/bold red]")
-        raise typer.Exit(code=1)
+    if stdin_password:
+        password = _read_stdin_password(username)
 
-    # Get username and password, prompting if necessary
-    if not username or not password:
-        username, password = get_username_and_password(username, password)
-
-    # Create the new user
-    hashed_password = password_hasher.hash(password)
-    new_user = schemas.UserCreate(
-        display_name=username,
-        username=username,
-        password_hash=hashed_password,
-        password_hash_algorithm="argon2id",
-        auth_method="local",
-        uuid=uuid.uuid4(),
-        is_admin=admin,
-    )
-    create_user_in_db(db, new_user)
-    print(f"User with username '{username}' created and password set.")
+    with db_session() as db:
+        # Check for existing user *before* potentially prompting
+        if username and get_user_by_username_from_db(db, username):
+            print("[bold red]Error: User already exists.[/bold red]")
+            raise typer.Exit(code=1)
+
+        # Get username and password, prompting if necessary
+        if not username:
+            username, password = get_username_and_password(username, password)
+            # Check the prompted username before spending time on hashing.
+            if get_user_by_username_from_db(db, username):
+                print("[bold red]Error: User already exists.[/bold red]")
+                raise typer.Exit(code=1)
+        elif not password:
+            username, password = get_username_and_password(username, password)
+
+        # Create the new user. The values are prepared before hashing so the
+        # hashing is the only slow step left before the insert. They are already
+        # typed correctly, so the row is created without schema validation.
+        user_fields = dict(
+            display_name=username,
+            username=username,
+            password_hash_algorithm="argon2id",
+            auth_method="local",
+            uuid=uuid.uuid4(),
+            is_admin=admin,
+        )
+        user_fields["password_hash"] = password_hasher.hash(password)
+        create_user_row_in_db(db, **user_fields)
+        print(f"User with username '{username}' created and password set.")
+
+
+def _get_local_user(db, username: str):
+    """Returns a local user, exits with an error if it is missing or not local."""
+    from datastores.sql.crud.user import get_user_by_username_from_db
+
+    existing_user = get_user_by_username_from_db(db, username)
+    if not existing_user:
+        print("[bold red]Error: User does not exist.[/bold red]")
+        raise typer.Exit(code=1)
+    if existing_user.auth_method != "local":
+        print(
+            "[bold red]Error: You can only change password for local users.[/bold red]"
+        )
+        raise typer.Exit(code=1)
+    return existing_user
 
 
 @app.command()
@@ -104,34 +160,32 @@ def change_password(
     new_password: Optional[str] = typer.Option(
         None, "--password", "-p", help="New password for the user."
     ),
+    stdin_password: bool = typer.Option(
+        False, "--stdin-password", help="Read the password from stdin."
+    ),
 ):
     """Changes the password of an existing user."""
-    db = database.SessionLocal()
-    existing_user = None
+    from lib.password_hashing import password_hasher
 
-    # Check for existing user *before* potentially prompting
-    if username:
-        existing_user = get_user_by_username_from_db(db, username)
-        if not existing_user:
-            print("[bold red]Error: User does not exist.[/bold red]")
-            raise typer.Exit(code=1)
-        if existing_user.auth_method != "local":
-            print(
-                "[bold red]Error: You can only change password for local users.[/bold red]"
-            )
-            raise typer.Exit(code=1)
+    if stdin_password:
+        new_password = _read_stdin_password(username)
 
-    # Get username and password, prompting if necessary
-    if not username or not new_password:
-        username, new_password = get_username_and_password(username, new_password)
+    with db_session() as db:
+        # Check for existing user *before* potentially prompting
+        existing_user = _get_local_user(db, username) if username else None
 
-    if not existing_user:
-        existing_user = get_user_by_username_from_db(db, username)
+        # Get username and password, prompting if necessary
+        if not username or not new_password:
+            username, new_password = get_username_and_password(username, new_password)
 
-    existing_user.password_hash = password_hasher.hash(new_password)
-    db.add(existing_user)
-    db.commit()
-    print(f"Password updated for user '{username}'.")
+        # Check the prompted username before spending time on hashing.
+        if not existing_user:
+            existing_user = _get_local_user(db, username)
+
+        existing_user.password_hash = password_hasher.hash(new_password)
+        db.add(existing_user)
+        db.commit()
+        print(f"Password updated for user '{username}'.")
 
 
 @app.command()
@@ -142,24 +196,29 @@ def set_admin(
     ),
 ):
     """Set or remove admin privileges for a user."""
-    db = database.SessionLocal()
+    from datastores.sql.crud.user import get_user_by_username_from_db
 
-    if not username:
-        username = Prompt.ask("[bold blue]Enter username[/]")
+    with db_session() as db:
+        if not username:
+            from rich.prompt import Prompt
 
-    existing_user = get_user_by_username_from_db(db, username)
-    if not existing_user:
-        print(f"[bold red]Error: User with username '{username}' not found.[/bold red]")
-        raise typer.Exit(code=1)
+            username = Prompt.ask("[bold blue]Enter username[/]")
 
-    existing_user.is_admin = admin
-    db.add(existing_user)
-    db.commit()
+        existing_user = get_user_by_username_from_db(db, username)
+        if not existing_user:
+            print(
+                f"[bold red]Error: User with username '{username}' not found.[/bold red]"
+            )
+            raise typer.Exit(code=1)
 
-    if admin:
-        print(f"'{username}' is now an admin.")
-    else:
-        print(f"Admin privileges removed for '{username}'.")
+        existing_user.is_admin = admin
+        db.add(existing_user)
+        db.commit()
+
+        if admin:
+            print(f"'{username}' is now an admin.")
+        else:
+            print(f"Admin privileges removed for '{username}'.")
 
 
 @app.command()
@@ -167,102 +226,263 @@ def user_details(
     username: str = typer.Argument(..., help="Username of the user."),
 ):
     """Displays details of a user in a table."""
-    db = database.SessionLocal()
+    from rich.table import Table
+    from sqlalchemy import select
+
+    from datastores.sql.models.user import User
+
+    with db_session() as db:
+        existing_user = db.execute(
+            select(
+                User.uuid,
+                User.display_name,
+                User.username,
+                User.auth_method,
+                User.is_admin,
+            ).where(User.username == username, User.is_deleted.is_not(True))
+        ).first()
+        if not existing_user:
+            print(
+                f"[bold red]Error: User with username '{username}' not found.[/bold red]"
+            )
+            raise typer.Exit(code=1)
+
+        table = Table(title=f"User Details: {username}")
+        table.add_column("Attribute", style="cyan", width=12)
+        table.add_column("Value", style="magenta")
+        table.add_row("UUID", str(existing_user.uuid))
+        table.add_row("Display Name", existing_user.display_name)
+        table.add_row("Username", existing_user.username)
+        table.add_row("Auth Method", existing_user.auth_method)
+        table.add_row("Is Admin", str(existing_user.is_admin))
+
+        _get_table_console().print(table)
+
+
+class OutputFormat(str, enum.Enum):
+    """Output formats for the list commands."""
+
+    TABLE = "table"
+    TSV = "tsv"
+    JSON = "json"
+
+
+@functools.cache
+def _get_table_console():
+    """Returns the console used for tables.
+
+    Tables are printed without recording and without syntax highlighting, which
+    rich.print would otherwise apply to every cell.
+    """
+    from rich.console import Console
+
+    return Console(record=False, highlight=False, soft_wrap=True)
 
-    existing_user = get_user_by_username_from_db(db, username)
-    if not existing_user:
-        print(f"[bold red]Error: User with username '{username}' not found.[/bold red]")
-        raise typer.Exit(code=1)
 
-    table = Table(title=f"User Details: {username}")
-    table.add_column("Attribute", style="cyan", width=12)
-    table.add_column("Value", style="magenta")
-    table.add_row("UUID", str(existing_user.uuid))
-    table.add_row("Display Name", existing_user.display_name)
-    table.add_row("Username", existing_user.username)
-    table.add_row("Auth Method", existing_user.auth_method)
-    table.add_row("Is Admin", str(existing_user.is_admin))
+def _print_table(title, columns, rows):
+    """Renders rows as a rich table.
 
-    print(table)
+    On a terminal the rows are added while they are streamed in. Otherwise the
+    finished table is printed once, as a live display is only redrawn on terminals.
+
+    Args:
+        title (str): Title of the table.
+        columns (list): (header, style) tuple per column.
+        rows (Iterable[tuple]): Rows of formatted values.
+    """
+    from rich.live import Live
+    from rich.table import Table
+
+    console = _get_table_console()
+    table = Table(title=title)
+    for header, style in columns:
+        # Long values such as UUIDs are folded onto the next line, not truncated.
+        table.add_column(header, style=style, overflow="fold")
+
+    if not console.is_terminal:
+        for row in rows:
+            table.add_row(*row)
+        console.print(table)
+        return
+
+    with Live(table, console=console, refresh_per_second=4):
+        for row in rows:
+            table.add_row(*row)
+
+
+def _format_row(row):
+    """Formats all values of a row as strings for TABLE and TSV output."""
+    return tuple(str(value) for value in row)
+
+
+def _json_default(value):
+    """Serializes values that json does not support, e.g. datetimes."""
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+def _write_rows(output_format, keys, rows):
+    """Writes rows as TSV or JSON to stdout without rich rendering.
+
+    Args:
+        output_format (OutputFormat): TSV or JSON.
+        keys (Iterable[str]): Column names.
+        rows (Iterable[tuple]): Rows of values. They are formatted as strings for
+            TSV, JSON keeps native types and writes datetimes in ISO 8601 format.
+    """
+    keys = list(keys)
+    if output_format == OutputFormat.TSV:
+        sys.stdout.write("\t".join(keys) + "\n")
+        sys.stdout.writelines("\t".join(_format_row(row)) + "\n" for row in rows)
+    else:
+        json.dump(
+            [dict(zip(keys, row)) for row in rows],
+            sys.stdout,
+            indent=2,
+            default=_json_default,
+        )
+        sys.stdout.write("\n")
 
 
 @app.command()
-def list_users():
+def list_users(
+    output_format: OutputFormat = typer.Option(
+        OutputFormat.TABLE, "--format", "-f", help="Output format."
+    ),
+):
     """Displays a list of all users in a table."""
-    db = database.SessionLocal()
-    users = get_users_from_db(db)
-
-    table = Table(title="List of Users")
-    table.add_column("Username", style="green")
-    table.add_column("Display Name", style="magenta")
-    table.add_column("UUID", style="cyan")
-    table.add_column("Is Admin", style="yellow")
-    table.add_column("Is Active", style="yellow")
-    table.add_column("Is Robot", style="yellow")
-    table.add_column("Created", style="steel_blue")
-
-    for user in users:
-        table.add_row(
-            user.username,
-            user.display_name,
-            str(user.uuid),
-            str(user.is_admin),
-            str(user.is_active),
-            str(user.is_robot),
-            str(user.created_at),
+    from sqlalchemy import String, cast, select
+
+    from datastores.sql.models.user import User
+
+    with db_session() as db:
+        # Select only the displayed columns instead of loading full User objects,
+        # and stream them to the output as they arrive. The UUID is formatted by
+        # the database instead of creating and formatting a UUID object per row.
+        users = db.execute(
+            select(
+                User.username,
+                User.display_name,
+                cast(User.uuid, String).label("uuid"),
+                User.is_admin,
+                User.is_active,
+                User.is_robot,
+                User.created_at,
+            )
+            .where(User.is_deleted.is_not(True))
+            .execution_options(yield_per=LIST_USERS_BATCH_SIZE)
         )
+        if output_format == OutputFormat.TABLE:
+            _print_table(
+                "List of Users",
+                [
+                    ("Username", "green"),
+                    ("Display Name", "magenta"),
+                    ("UUID", "cyan"),
+                    ("Is Admin", "yellow"),
+                    ("Is Active", "yellow"),
+                    ("Is Robot", "yellow"),
+                    ("Created", "steel_blue"),
+                ],
+                (_format_row(user) for user in users),
+            )
+        else:
+            _write_rows(output_format, users.keys(), users)
 
-    print(table)
 
+def _add_owner_roles(db, model, foreign_key):
+    """Adds OWNER roles to all rows of a model that are missing one.
 
-@app.command()
-def fix_ownership():
-    """Fixes ownership by adding missing OWNER roles to Files and Folders."""
-    db = database.SessionLocal()
+    Runs as a single INSERT ... SELECT with an anti-join against the existing OWNER
+    roles, so no rows are moved through Python. Rows that already have an owner are
+    never selected, which makes the operation safe to run again.
 
-    # Query for Files and Folders without an OWNER UserRole
-    files_without_owner = (
-        db.query(File)
-        .filter(
-            not_(
-                File.user_roles.any(
-                    UserRole.role == Role.OWNER
-                )  # Check if any UserRole has Role.OWNER
-            )
+    Args:
+        db (Session): SQLAlchemy session.
+        model: File or Folder model class.
+        foreign_key (str): Name of the UserRole column referencing the model.
+
+    Returns:
+        int: Number of OWNER roles added.
+    """
+    from sqlalchemy import and_, insert, literal, select
+
+    from datastores.sql.models.role import Role
+    from datastores.sql.models.user import UserRole
+
+    owner_role_join = and_(
+        getattr(UserRole, foreign_key) == model.id, UserRole.role == Role.OWNER
+    )
+    rows_without_owner = (
+        select(
+            model.user_id,
+            literal(Role.OWNER, UserRole.__table__.c.role.type),
+            model.id,
         )
-        .all()
+        .outerjoin(UserRole, owner_role_join)
+        .where(UserRole.id.is_(None), model.is_deleted.is_not(True))
     )
-
-    folders_without_owner = (
-        db.query(Folder)
-        .filter(
-            not_(
-                Folder.user_roles.any(
-                    UserRole.role == Role.OWNER
-                )  # Check if any UserRole has Role.OWNER
-            )
+    result = db.execute(
+        insert(UserRole.__table__).from_select(
+            ["user_id", "role", foreign_key], rows_without_owner
         )
-        .all()
     )
+    db.commit()
+    return result.rowcount
 
-    # Add OWNER UserRole to the queried Files and Folders
-    for file_obj in files_without_owner:
-        owner_role = UserRole(user=file_obj.user, role=Role.OWNER)
-        db.add(owner_role)
-        file_obj.user_roles.append(owner_role)
 
-    for folder_obj in folders_without_owner:
-        owner_role = UserRole(user=folder_obj.user, role=Role.OWNER)
-        db.add(owner_role)
-        folder_obj.user_roles.append(owner_role)
+@app.command()
+def fix_ownership():
+    """Fixes ownership by adding missing OWNER roles to Files and Folders."""
+    from datastores.sql.models.file import File
+    from datastores.sql.models.folder import Folder
 
-    # Commit the changes to the database
-    db.commit()
+    with db_session() as db:
+        num_files = _add_owner_roles(db, File, "file_id")
+        num_folders = _add_owner_roles(db, Folder, "folder_id")
+
+        print(
+            f"Added missing OWNER roles to {num_files} files and {num_folders} folders."
+        )
 
-    print(
-        f"Added missing OWNER roles to {len(files_without_owner)} files and {len(folders_without_owner)} folders."
+
+@app.command()
+def tune_argon2(
+    target_ms: int = typer.Option(500, help="Target hashing time in milliseconds."),
+    memory_kib: int = typer.Option(65536, help="Memory cost in KiB."),
+    max_memory_kib: Optional[int] = typer.Option(
+        None, help="Also calibrate the memory cost, up to this many KiB."
+    ),
+    parallelism: Optional[int] = typer.Option(
+        None, help="Number of parallel lanes, defaults to the server default of 4."
+    ),
+):
+    """Calibrates the Argon2 memory and time cost for this host."""
+    from lib.password_hashing import (
+        ARGON2_DEFAULT_PARALLELISM,
+        calibrate_memory_cost,
+        calibrate_time_cost,
     )
 
+    if parallelism is None:
+        parallelism = ARGON2_DEFAULT_PARALLELISM
+    time_cost = 1
+    if max_memory_kib:
+        memory_kib = calibrate_memory_cost(
+            target_ms, memory_kib, max_memory_kib, parallelism
+        )
+    # Only raise the time cost if memory alone could not reach the target.
+    if not max_memory_kib or memory_kib >= max_memory_kib:
+        time_cost = calibrate_time_cost(target_ms, memory_kib, parallelism)
+    print(f"Calibrated Argon2 parameters for a target of {target_ms}ms.")
+    print("Add the following to your settings.toml:\n")
+    # Escaped, rich would otherwise parse the section header as markup.
+    print("\\[auth.argon2]")
+    print(f"time_cost = {time_cost}")
+    print(f"memory_cost = {memory_kib}")
+    print(f"parallelism = {parallelism}")
+
 
 if __name__ == "__main__":
     app()
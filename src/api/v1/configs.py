@@ -12,27 +12,37 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from fastapi import APIRouter
+import functools
+import json
+
+from fastapi import APIRouter, Response
+from fastapi.encoders import jsonable_encoder
 
 from config import config, get_active_cloud_provider, get_active_llms
 
 
 router = APIRouter()
 
+# Data types that will be allowed to be returned as unescaped HTML for use in
+# sandboxed iframe preview.
+ALLOWED_DATA_TYPES_PREVIEW = config.get("ui", {}).get("allowed_data_types_preview", [])
+
+
+@functools.cache
+def _system_config_body() -> bytes:
+    """Returns the serialized system config.
+
+    The config does not change while the server is running, so the response body
+    is only serialized once.
+    """
+    system_config = {
+        "active_llms": get_active_llms(),
+        "active_cloud": get_active_cloud_provider(),
+        "allowed_data_types_preview": ALLOWED_DATA_TYPES_PREVIEW,
+    }
+    return json.dumps(jsonable_encoder(system_config)).encode("utf-8")
+
 
 @router.get("/system/")
 def get_system_config():
-    active_llms = get_active_llms()
-    active_cloud = get_active_cloud_provider()
-
-    # Data types that will be allowed to be returned as unescaped HTML for use in
-    # sandboxed iframe preview.
-    allowed_data_types_preview = config.get("ui", {}).get(
-        "allowed_data_types_preview", []
-    )
-
-    return {
-        "active_llms": active_llms,
-        "active_cloud": active_cloud,
-        "allowed_data_types_preview": allowed_data_types_preview,
-    }
+    return Response(content=_system_config_body(), media_type="application/json")
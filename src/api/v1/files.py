@@ -11,14 +11,24 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import asyncio
+import codecs
 import html
 import json
 import os
-from typing import List
+from typing import List, Optional
 from uuid import uuid4
 
 import aiofiles
-from fastapi import APIRouter, BackgroundTasks, Depends, File, Query, UploadFile, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    HTTPException,
+    Query,
+    UploadFile,
+    status,
+)
 from fastapi.responses import FileResponse, HTMLResponse, StreamingResponse
 from sqlalchemy.orm import Session
 
@@ -38,8 +48,9 @@ from datastores.sql.database import get_db_connection
 from datastores.sql.models.role import Role
 from datastores.sql.models.workflow import Task
 from lib.constants import cloud_provider_data_type_mapping
-from lib.file_hashes import generate_hashes
-from lib.llm_summary import generate_summary
+from lib.fast_copy import concatenate_files, save_file, write_at_offset
+from lib.file_hashes import generate_hashes_in_background, new_hashers
+from lib.llm_summary import generate_summary_in_background
 
 from . import schemas
 
@@ -48,61 +59,226 @@ router = APIRouter()
 # File types that are trusted to be returned unescaped to the client
 ALLOWED_DATA_TYPES_PREVIEW = config.get("ui", {}).get("allowed_data_types_preview", [])
 
+# Uploads of at least this size are kept out of the page cache while they are
+# written, so they do not evict data that is read more often.
+UPLOAD_DROP_CACHE_MIN_SIZE = 64 * 1024 * 1024  # 64MB
+
+# Maximum number of bytes of a file that are rendered in the content preview.
+PREVIEW_MAX_BYTES = config.get("ui", {}).get("preview_max_bytes", 10 * 1024 * 1024)
+
+# Number of bytes read, escaped and sent per part of the streamed preview.
+PREVIEW_READ_SIZE = 64 * 1024
+
+# Number of bytes at the start of a file used to detect the preview encoding.
+PREVIEW_ENCODING_DETECTION_SIZE = 4096
+
+# Number of bytes read for the start of the preview.
+PREVIEW_HEAD_SIZE = min(PREVIEW_ENCODING_DETECTION_SIZE, PREVIEW_MAX_BYTES)
+
+# Appended to the preview when the file is larger than PREVIEW_MAX_BYTES.
+PREVIEW_TRUNCATED_MESSAGE = (
+    f"\n\n[Preview truncated to the first {PREVIEW_MAX_BYTES} bytes. "
+    "Download the file to see the full content.]"
+).encode()
+
+# Shown instead of the content of files that look binary.
+PREVIEW_BINARY_FILE_MESSAGE = b"Binary file, no preview available."
+
+# UTF-16 text without a byte order mark is recognized by NUL bytes in every other
+# position, the high bytes of ASCII characters. At least this share of the bytes
+# in one position must be NUL, and at most PREVIEW_UTF16_MAX_OTHER_NUL_RATIO of
+# the bytes in the other position.
+PREVIEW_UTF16_MIN_NUL_RATIO = 0.5
+PREVIEW_UTF16_MAX_OTHER_NUL_RATIO = 0.05
+
+# Encodings tried for the preview, in order. ISO-8859-1 can decode any byte
+# sequence, so it always succeeds as the last option.
+PREVIEW_ENCODINGS = ("utf-8", "utf-16", "ISO-8859-1")
+
+# Opening HTML of the content preview, rendered per theme at import time.
+PREVIEW_HTML_PREFIX_TEMPLATE = """
+    <html style="background:{background_color}">
+        <pre style="color:{font_color};padding:10px;white-space: pre-wrap;">"""
+PREVIEW_HTML_PREFIXES = {
+    "light": PREVIEW_HTML_PREFIX_TEMPLATE.format(
+        background_color="#fff", font_color="#000"
+    ).encode(),
+    "dark": PREVIEW_HTML_PREFIX_TEMPLATE.format(
+        background_color="#000", font_color="#fff"
+    ).encode(),
+}
+PREVIEW_HTML_SUFFIX = b"""</pre>
+    </html>
+    """
+
 
 # Get file
 # TODO: Return different response if folder is deleted.
 @router.get("/{file_id}")
 @require_access(allowed_roles=[Role.VIEWER, Role.EDITOR, Role.OWNER])
 def get_file(
-    file_id: str,
+    file_id: int,
     db: Session = Depends(get_db_connection),
     current_user: schemas.User = Depends(get_current_active_user),
 ) -> schemas.FileResponse:
     """Get a file's metadata from the database."""
-    return get_file_from_db(db, int(file_id))
+    return get_file_from_db(db, file_id)
+
+
+def _detect_utf16_without_bom(head):
+    """Returns the UTF-16 variant of text without a byte order mark.
+
+    Windows logs and registry exports are often written as UTF-16 without a byte
+    order mark. Mostly ASCII text then has a NUL byte at every odd (little endian)
+    or every even (big endian) position.
+
+    Args:
+        head (bytes): The first bytes of the file.
+
+    Returns:
+        str: "utf-16-le" or "utf-16-be", or None if head does not look like
+            UTF-16 text.
+    """
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return None
+    even_bytes, odd_bytes = head[0::2], head[1::2]
+    if not odd_bytes:
+        return None
+    for encoding, nul_bytes, other_bytes in (
+        ("utf-16-le", odd_bytes, even_bytes),
+        ("utf-16-be", even_bytes, odd_bytes),
+    ):
+        if (
+            nul_bytes.count(0) >= len(nul_bytes) * PREVIEW_UTF16_MIN_NUL_RATIO
+            and other_bytes.count(0)
+            <= len(other_bytes) * PREVIEW_UTF16_MAX_OTHER_NUL_RATIO
+        ):
+            try:
+                codecs.getincrementaldecoder(encoding)().decode(head, final=False)
+            except UnicodeDecodeError:
+                return None
+            return encoding
+    return None
+
+
+def _is_binary_preview(head):
+    """Returns whether the start of a file looks like binary data.
+
+    Text does not contain NUL bytes, except when encoded as UTF-16, which is
+    recognized by its byte order mark or by the pattern of its NUL bytes.
+
+    Args:
+        head (bytes): The first bytes of the file.
+
+    Returns:
+        bool: True if the file looks binary.
+    """
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return False
+    return b"\x00" in head and not _detect_utf16_without_bom(head)
+
+
+def _detect_preview_encoding(head, is_whole_file):
+    """Returns the first preview encoding that can decode the start of a file.
+
+    Args:
+        head (bytes): The first bytes of the file.
+        is_whole_file (bool): Whether head holds the whole file. Otherwise a
+            character cut off at the end of head is not counted as invalid.
+
+    Returns:
+        str: Name of the encoding.
+    """
+    # UTF-16 without a byte order mark is also valid UTF-8, so check it first.
+    if utf16_encoding := _detect_utf16_without_bom(head):
+        return utf16_encoding
+    for encoding in PREVIEW_ENCODINGS:
+        try:
+            codecs.getincrementaldecoder(encoding)().decode(head, final=is_whole_file)
+            return encoding
+        # The UTF-16 decoder raises UnicodeError for data without a BOM.
+        except UnicodeError:
+            continue
+    return PREVIEW_ENCODINGS[-1]
+
+
+async def _iter_preview_text(fh, head, escape_content):
+    """Reads, decodes and escapes the preview of a text file in parts.
+
+    The encoding is detected on the start of the file. Invalid sequences further
+    on are replaced rather than restarting the preview. If the file is larger than
+    PREVIEW_MAX_BYTES, the preview ends with PREVIEW_TRUNCATED_MESSAGE.
+
+    Args:
+        fh: aiofiles file object, positioned after head.
+        head (bytes): The first bytes of the file, already read from fh.
+        escape_content (bool): Whether to HTML escape the content.
+
+    Yields:
+        bytes: UTF-8 encoded parts of the preview.
+    """
+    encoding = _detect_preview_encoding(head, len(head) < PREVIEW_HEAD_SIZE)
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    data = head
+    bytes_left = PREVIEW_MAX_BYTES - len(head)
+    while True:
+        # The last pass has no data left and flushes the decoder, which replaces a
+        # character that was cut off at the end of the preview.
+        part = decoder.decode(data, final=not data)
+        if escape_content:
+            part = html.escape(part)
+        yield part.encode("utf-8", "replace")
+        if not data:
+            break
+        data = b""
+        if bytes_left > 0:
+            data = await fh.read(min(PREVIEW_READ_SIZE, bytes_left))
+            bytes_left -= len(data)
+
+    if bytes_left <= 0 and await fh.read(1):
+        yield PREVIEW_TRUNCATED_MESSAGE
 
 
 # Get file content
 @router.get("/{file_id}/content", response_class=HTMLResponse)
 @require_access(allowed_roles=[Role.VIEWER, Role.EDITOR, Role.OWNER])
-def get_file_content(
-    file_id: str,
+async def get_file_content(
+    file_id: int,
     theme: str = "light",
     unescaped: bool = False,
     db: Session = Depends(get_db_connection),
     current_user: schemas.User = Depends(get_current_active_user),
-) -> HTMLResponse:
-    """Returns an HTML response with the file's content."""
-    file = get_file_from_db(db, file_id)
-    encodings_to_try = ["utf-8", "utf-16", "ISO-8859-1"]
+) -> StreamingResponse:
+    """Returns an HTML response with the file's content.
 
-    for encoding in encodings_to_try:
-        try:
-            with open(file.path, "r", encoding=encoding) as fh:
-                content = fh.read()
-                break
-        except FileNotFoundError:
-            content = "File not found"
-        except UnicodeDecodeError:
-            continue
-    background_color = "#fff"
-    font_color = "#000"
-    if theme == "dark":
-        background_color = "#000"
-        font_color = "#fff"
+    The content is read, decoded and escaped in parts while it is sent, so memory
+    use is bounded by the part size. At most PREVIEW_MAX_BYTES are rendered.
+    """
+    file = get_file_from_db(db, file_id)
+    file_path = file.path
+    html_prefix = PREVIEW_HTML_PREFIXES.get(theme, PREVIEW_HTML_PREFIXES["light"])
 
-    html_source_content = html.escape(content)
+    escape_content = True
     if unescaped:
         if file.data_type in ALLOWED_DATA_TYPES_PREVIEW:
-            html_source_content = content
+            escape_content = False
 
-    html_content = f"""
-    <html style="background:{background_color}">
-        <pre style="color:{font_color};padding:10px;white-space: pre-wrap;">{html_source_content}</pre>
-    </html>
-    """
-    # return content
-    return HTMLResponse(content=html_content, status_code=200)
+    async def iter_html():
+        yield html_prefix
+        try:
+            async with aiofiles.open(file_path, "rb") as fh:
+                head = await fh.read(PREVIEW_HEAD_SIZE)
+                # Stop before decoding files that can not be shown as text.
+                if _is_binary_preview(head):
+                    yield PREVIEW_BINARY_FILE_MESSAGE
+                else:
+                    async for part in _iter_preview_text(fh, head, escape_content):
+                        yield part
+        except FileNotFoundError:
+            yield b"File not found"
+        yield PREVIEW_HTML_SUFFIX
+
+    return StreamingResponse(iter_html(), media_type="text/html", status_code=200)
 
 
 # Download file
@@ -132,24 +308,28 @@ async def download_file_stream(
     db: Session = Depends(get_db_connection),
     current_user: schemas.User = Depends(get_current_active_user),
 ):
-    """Downloads a file using streaming."""
-    file = get_file_from_db(db, file_id)
-    file_path = file.path
-    CHUNK_SIZE = 10 * 1024 * 1024  # 10MB
+    """Downloads a file using streaming.
 
-    async def iterfile():
-        async with aiofiles.open(file_path, "rb") as f:
-            while chunk := await f.read(CHUNK_SIZE):
-                yield chunk
+    FileResponse sends the file with sendfile where available, so the contents
+    are not copied through Python, and supports HTTP range requests.
 
-    headers = {
-        "Access-Control-Expose-Headers": "Content-Disposition",
-        "Content-Disposition": f'attachment; filename="{file.display_name}"',
-        "Content-Length": str(file.filesize),
-    }
-
-    return StreamingResponse(
-        iterfile(), headers=headers, media_type="application/octet-stream"
+    Raises:
+        HTTPException: If the file does not exist on disk.
+    """
+    file = get_file_from_db(db, file_id)
+    # Content-Length is taken from the file on disk rather than the database, so
+    # it always matches the bytes that are sent.
+    try:
+        stat_result = await asyncio.to_thread(os.stat, file.path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found.")
+    headers = {"Access-Control-Expose-Headers": "Content-Disposition"}
+    return FileResponse(
+        path=file.path,
+        filename=file.display_name,
+        media_type="application/octet-stream",
+        headers=headers,
+        stat_result=stat_result,
     )
 
 
@@ -164,8 +344,24 @@ def delete_file(
     delete_file_from_db(db, file_id)
 
 
+def _set_file_hashes(new_file, hashers):
+    """Sets the digests of hashes calculated while writing a file.
+
+    Args:
+        new_file (schemas.FileCreate): The file to be created.
+        hashers (dict): Hash object per algorithm, from new_hashers().
+    """
+    new_file.hash_md5 = hashers["md5"].hexdigest()
+    new_file.hash_sha1 = hashers["sha1"].hexdigest()
+    new_file.hash_sha256 = hashers["sha256"].hexdigest()
+
+
 # Upload file
-@router.post("/upload", status_code=status.HTTP_201_CREATED)
+@router.post(
+    "/upload",
+    status_code=status.HTTP_201_CREATED,
+    response_model=Optional[schemas.FileResponse],
+)
 @require_access(allowed_roles=[Role.EDITOR, Role.OWNER])
 async def upload_files(
     file: UploadFile = File(...),
@@ -178,27 +374,43 @@ async def upload_files(
     resumableFilename: str = Query(...),
     resumableRelativePath: str | None = None,
     folder_id: int = Query(...),
-    background_tasks: BackgroundTasks = BackgroundTasks(),
     db: Session = Depends(get_db_connection),
     current_user: schemas.User = Depends(get_current_active_user),
 ):
     """Uploads a file to the server.
 
     Returns:
-        File: File metadata.
+        File: File metadata once the last chunk is uploaded, otherwise None.
     """
     is_last_chunk = resumableChunkNumber == resumableTotalChunks
     folder = get_folder_from_db(db, folder_id)
 
-    # Construct the chunk file path
-    chunk_file_path = os.path.join(
-        folder.path, f"{resumableIdentifier}.{resumableChunkNumber}"
-    )
+    # When the chunk size is known every chunk is written straight into a
+    # partial file at its final offset, so the file does not have to be
+    # assembled from temporary chunk files afterwards.
+    write_in_place = bool(resumableChunkSize)
+    partial_file_path = os.path.join(folder.path, f"{resumableIdentifier}.part")
+
+    # A file uploaded in a single chunk is hashed while it is written, so it does
+    # not have to be read back from disk to calculate the hashes.
+    hashers = new_hashers() if write_in_place and resumableTotalChunks == 1 else {}
 
     # Save the chunk to disk
-    async with aiofiles.open(chunk_file_path, "wb") as fh:
-        while content := await file.read(1024000):  # Read 1MB chunks
-            await fh.write(content)
+    if write_in_place:
+        await asyncio.to_thread(
+            write_at_offset,
+            partial_file_path,
+            file.file,
+            (resumableChunkNumber - 1) * resumableChunkSize,
+            resumableTotalSize if resumableChunkNumber == 1 else None,
+            hashers=hashers.values(),
+            drop_cache=(resumableTotalSize or 0) >= UPLOAD_DROP_CACHE_MIN_SIZE,
+        )
+    else:
+        chunk_file_path = os.path.join(
+            folder.path, f"{resumableIdentifier}.{resumableChunkNumber}"
+        )
+        await asyncio.to_thread(save_file, chunk_file_path, file.file)
 
     # Return early if this is NOT the last chunk.
     if not is_last_chunk:
@@ -210,16 +422,18 @@ async def upload_files(
     output_filename = f"{uuid.hex}{file_extension}"
     output_path = os.path.join(folder.path, output_filename)
 
-    async with aiofiles.open(output_path, "wb") as outfile:
-        for chunk_number in range(1, resumableTotalChunks + 1):
-            chunk_path = os.path.join(
-                folder.path, f"{resumableIdentifier}.{chunk_number}"
-            )
-            async with aiofiles.open(chunk_path, "rb") as infile:
-                while content := await infile.read(1024000):  # Read 1MB chunks
-                    await outfile.write(content)
-            # Remove the temporary chunk file.
-            os.remove(chunk_path)
+    if write_in_place:
+        os.rename(partial_file_path, output_path)
+    else:
+        chunk_paths = [
+            os.path.join(folder.path, f"{resumableIdentifier}.{chunk_number}")
+            for chunk_number in range(1, resumableTotalChunks + 1)
+        ]
+        # Copy the chunks in a worker thread to keep the event loop responsive,
+        # and remove the temporary chunk files as they are consumed.
+        await asyncio.to_thread(
+            concatenate_files, output_path, chunk_paths, remove_inputs=True
+        )
 
     # Save to database
     new_file = schemas.FileCreate(
@@ -228,22 +442,25 @@ async def upload_files(
         filename=resumableFilename,
         extension=file_extension.lstrip("."),
         user_id=current_user.id,
+        folder_id=folder_id,
     )
 
-    if folder_id != "null":
-        new_file.folder_id = int(folder_id)
+    if hashers:
+        _set_file_hashes(new_file, hashers)
 
     new_file_db = create_file_in_db(db, new_file, current_user)
-    background_tasks.add_task(generate_hashes, file_id=new_file_db.id)
+    if not hashers:
+        generate_hashes_in_background(new_file_db.id)
 
     return new_file_db
 
 
 # Create cloud disk file
-@router.post("/cloud", status_code=status.HTTP_201_CREATED)
+@router.post(
+    "/cloud", status_code=status.HTTP_201_CREATED, response_model=schemas.FileResponse
+)
 @require_access(allowed_roles=[Role.EDITOR, Role.OWNER])
 async def create_cloud_disk_file(
-    background_tasks: BackgroundTasks,
     request: schemas.CloudDiskCreateRequest,
     db: Session = Depends(get_db_connection),
     current_user: schemas.User = Depends(get_current_active_user),
@@ -259,8 +476,14 @@ async def create_cloud_disk_file(
     cloud_provider = get_active_cloud_provider()
     cloud_provider["disk_name"] = request.disk_name
 
-    with open(output_path, "w") as fh:
-        fh.write(json.dumps(cloud_provider))
+    content = json.dumps(cloud_provider).encode("utf-8")
+    with open(output_path, "wb") as fh:
+        fh.write(content)
+
+    # The content is already in memory, hash it here instead of reading it back.
+    hashers = new_hashers()
+    for hasher in hashers.values():
+        hasher.update(content)
 
     # Save to database
     new_file = schemas.FileCreate(
@@ -270,12 +493,11 @@ async def create_cloud_disk_file(
         filename=request.disk_name,
         extension="json",
         user_id=current_user.id,
+        folder_id=request.folder_id,
     )
-    if request.folder_id != "null":
-        new_file.folder_id = int(request.folder_id)
+    _set_file_hashes(new_file, hashers)
 
     new_file_db = create_file_in_db(db, new_file, current_user)
-    background_tasks.add_task(generate_hashes, file_id=new_file_db.id)
 
     return new_file_db
 
@@ -287,7 +509,7 @@ async def create_cloud_disk_file(
 )
 @require_access(allowed_roles=[Role.VIEWER, Role.EDITOR, Role.OWNER])
 def get_workflows(
-    file_id: str,
+    file_id: int,
     db: Session = Depends(get_db_connection),
     current_user: schemas.User = Depends(get_current_active_user),
 ) -> List[schemas.WorkflowResponse]:
@@ -313,14 +535,16 @@ def get_task(
 def download_task_result(
     file_id: int,
     workflow_id: int,
-    task_id: str,
+    task_id: int,
     db: Session = Depends(get_db_connection),
     current_user: schemas.User = Depends(get_current_active_user),
 ) -> FileResponse:
     """Downloads a task result file based on its ID."""
     task = db.get(Task, task_id)
-    result = json.loads(task.result)
-    result_file_path = result.get("output_file_path")
+    result_file_path = task.output_file_path
+    # Tasks completed before the column was added only have it in the result.
+    if not result_file_path:
+        result_file_path = json.loads(task.result).get("output_file_path")
     filename = os.path.basename(result_file_path)
 
     headers = {"Access-Control-Expose-Headers": "Content-Disposition"}
@@ -349,7 +573,6 @@ def get_file_summary(
 @require_access(allowed_roles=[Role.EDITOR, Role.OWNER])
 def generate_file_summary(
     file_id: int,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db_connection),
     current_user: schemas.User = Depends(get_current_active_user),
 ):
@@ -360,8 +583,7 @@ def generate_file_summary(
     file_summary_db = create_file_summary_in_db(db, new_file_summary)
     active_llm = get_active_llms()[0]
 
-    background_tasks.add_task(
-        generate_summary,
+    generate_summary_in_background(
         llm_provider=active_llm["name"],
         llm_model=active_llm["config"]["model"],
         file_id=file_id,
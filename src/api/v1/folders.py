@@ -13,7 +13,7 @@
 # limitations under the License.
 from typing import List
 
-from fastapi import APIRouter, Depends, status, HTTPException
+from fastapi import APIRouter, Depends, status, HTTPException, Query
 from sqlalchemy.orm import Session
 
 from auth.common import get_current_active_user
@@ -38,6 +38,9 @@ from . import schemas
 
 router = APIRouter()
 
+# Maximum number of folders returned per page of a paginated listing.
+MAX_PAGE_SIZE = 1000
+
 
 # Get all root folders for a user
 @router.get("/")
@@ -80,6 +83,8 @@ def get_shared_folders(
 @require_access(allowed_roles=[Role.VIEWER, Role.EDITOR, Role.OWNER])
 def get_subfolders(
     folder_id: str,
+    cursor: int | None = None,
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
     db: Session = Depends(get_db_connection),
     current_user: schemas.User = Depends(get_current_active_user),
 ) -> List[schemas.FolderResponseCompact]:
@@ -88,6 +93,8 @@ def get_subfolders(
 
     Args:
         folder_id: The ID of the parent folder.
+        cursor: Optional ID of the last folder from the previous page.
+        limit: Optional maximum number of folders to return, at most MAX_PAGE_SIZE.
         db: The database session.
         current_user: The currently authenticated user.
 
@@ -97,7 +104,9 @@ def get_subfolders(
     Raises:
         HTTPException: If the parent folder does not exist or the user does not have permission to access it.
     """
-    return get_subfolders_from_db(db, parent_folder_id=folder_id)
+    return get_subfolders_from_db(
+        db, parent_folder_id=folder_id, cursor=cursor, limit=limit
+    )
 
 
 # Get folder
@@ -187,6 +187,7 @@ class FileCreate(BaseModel):
     magic_text: Optional[str] = None
     magic_mime: Optional[str] = None
     data_type: Optional[str] = None
+    # Hex digests, stored as raw bytes by the HexDigest column type.
     hash_md5: Optional[str] = None
     hash_sha1: Optional[str] = None
     hash_sha256: Optional[str] = None
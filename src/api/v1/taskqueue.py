@@ -21,6 +21,7 @@ from lib import celery_utils
 
 redis_url = os.getenv("REDIS_URL")
 celery = Celery(broker=redis_url, backend=redis_url)
+celery_utils.configure_redis_connections(celery)
 
 # Setup the queues. This function take all registered tasks on the celery task queue
 # and generate the task queue config automatically.
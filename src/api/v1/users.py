@@ -16,8 +16,7 @@ from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 
 from auth.common import (
-    create_jwt_token,
-    validate_jwt_token,
+    create_jwt_token_with_claims,
     get_current_active_user,
     get_db_connection,
 )
@@ -34,6 +33,10 @@ from config import config
 
 router = APIRouter()
 
+API_KEY_REFRESH_TOKEN_EXPIRE_MINUTES = config["auth"][
+    "jwt_header_default_refresh_expire_minutes"
+]
+
 
 @router.get("/me/")
 def get_current_user(
@@ -85,18 +88,12 @@ async def create_api_key_for_current_user(
     Returns:
         schemas.UserApiKeyResponse: The created API key.
     """
-    TOKEN_EXPIRE_MINUTES = config["auth"]["jwt_header_default_refresh_expire_minutes"]
-    refresh_token = create_jwt_token(
+    refresh_token, payload = create_jwt_token_with_claims(
         audience="api-client",
-        expire_minutes=TOKEN_EXPIRE_MINUTES,
+        expire_minutes=API_KEY_REFRESH_TOKEN_EXPIRE_MINUTES,
         subject=current_user.uuid.hex,
         token_type="refresh",
     )
-    payload = validate_jwt_token(
-        refresh_token,
-        expected_token_type="refresh",
-        expected_audience="api-client",
-    )
     new_api_key = schemas.UserApiKeyCreate(
         display_name=request.display_name,
         description=request.description,
@@ -21,7 +21,7 @@ from celery import chain as celery_chain
 from celery import group as celery_group
 from celery import signature
 from celery.app import Celery
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 
 from auth.common import get_current_active_user
@@ -41,11 +41,13 @@ from datastores.sql.crud.workflow import (
 from datastores.sql.database import get_db_connection
 from datastores.sql.models.workflow import Task
 from datastores.sql.models.role import Role
+from lib import celery_utils
 
 from . import schemas
 
 redis_url = os.getenv("REDIS_URL")
 celery = Celery(broker=redis_url, backend=redis_url)
+celery_utils.configure_redis_connections(celery)
 
 # Workflows in a folder context.
 router = APIRouter()
@@ -116,9 +118,12 @@ async def create_workflow(
         file_ids=request_body.file_ids,
         folder_id=new_workflow_folder.id,
     )
-    new_workflow = create_workflow_in_db(
-        db, new_workflow_db, template_id=request_body.template_id
-    )
+    try:
+        new_workflow = create_workflow_in_db(
+            db, new_workflow_db, template_id=request_body.template_id
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     return new_workflow
 
 
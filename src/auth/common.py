@@ -62,14 +62,17 @@ def raise_credentials_exception(detail: str = "Could not validate credentials"):
     )
 
 
-def create_jwt_token(
+def create_jwt_token_with_claims(
     audience: str,
     expire_minutes: int,
     subject: str,
     token_type: str,
     extra_data: dict = {},
 ):
-    """Creates a JWT access token with the given data and expiration time.
+    """Creates a JWT token and returns it together with the signed claims.
+
+    This lets callers read claims such as jti and exp without decoding and
+    validating the token they just created.
 
     Args:
         audience (str): The audience of the token (browser-client or api-client)
@@ -79,7 +82,7 @@ def create_jwt_token(
         extra_data (dict, optional): Additional data to be encoded in the token.
 
     Returns:
-        str: The encoded JWT token.
+        tuple[str, dict]: The encoded JWT token and its claims.
     """
     jwt_data = extra_data.copy()
     issued_at = datetime.now(timezone.utc)
@@ -95,6 +98,31 @@ def create_jwt_token(
     jwt_data.update({"jti": uuid.uuid4().hex})
     jwt_data.update({"token_type": token_type})
     encoded_jwt = jwt.encode(jwt_data, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
+    return encoded_jwt, jwt_data
+
+
+def create_jwt_token(
+    audience: str,
+    expire_minutes: int,
+    subject: str,
+    token_type: str,
+    extra_data: dict = {},
+):
+    """Creates a JWT access token with the given data and expiration time.
+
+    Args:
+        audience (str): The audience of the token (browser-client or api-client)
+        expires_delta (int): The expiration time in minutes of the token.
+        subject (str): The subject of the token (user UUID).
+        token_type (str): The type of token to be created, 'access' or 'refresh'.
+        extra_data (dict, optional): Additional data to be encoded in the token.
+
+    Returns:
+        str: The encoded JWT token.
+    """
+    encoded_jwt, _ = create_jwt_token_with_claims(
+        audience, expire_minutes, subject, token_type, extra_data
+    )
     return encoded_jwt
 
 
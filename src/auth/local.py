@@ -7,11 +7,11 @@ from starlette.responses import Response
 from config import config
 from datastores.sql.crud.user import get_user_by_username_from_db
 from datastores.sql.database import get_db_connection
+from lib.password_hashing import REHASH_ON_LOGIN, password_hasher
 
 from .common import create_jwt_token, generate_csrf_token, UI_SERVER_URL
 
 router = APIRouter()
-password_hasher = argon2.PasswordHasher()
 
 REFRESH_TOKEN_EXPIRE_MINUTES = config["auth"]["jwt_cookie_refresh_expire_minutes"]
 ACCESS_TOKEN_EXPIRE_MINUTES = config["auth"]["jwt_cookie_access_expire_minutes"]
@@ -51,6 +51,12 @@ async def auth_local(
             detail="Incorrect username or password",
         )
 
+    # Upgrade the stored hash if it was created with other Argon2 parameters than
+    # the configured ones.
+    if REHASH_ON_LOGIN and password_hasher.check_needs_rehash(db_user.password_hash):
+        db_user.password_hash = password_hasher.hash(form_data.password)
+        db.commit()
+
     # Create JWT access token with default expiry time.
     refresh_token = create_jwt_token(
         audience="browser-client",
@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import functools
 import os
 import tomllib
 
@@ -32,13 +33,22 @@ if settings_from_env and os.path.isfile(settings_from_env):
     settings_file = settings_from_env
 
 
-def get_config() -> dict:
-    """Load the settings from the settings.toml file."""
-    with open(settings_file, "rb") as fh:
+@functools.lru_cache(maxsize=4)
+def _load_config(path: str, mtime_ns: int) -> dict:
+    """Parse a settings file. Cached per path and modification time."""
+    with open(path, "rb") as fh:
         config = tomllib.load(fh)
     return config
 
 
+def get_config() -> dict:
+    """Load the settings from the settings.toml file.
+
+    The file is only parsed again if it has been modified since the last call.
+    """
+    return _load_config(settings_file, os.stat(settings_file).st_mtime_ns)
+
+
 def get_active_cloud_provider() -> dict:
     """Get the active cloud provider from config."""
     clouds = config.get("cloud", [])
@@ -56,8 +66,12 @@ def get_active_cloud_provider() -> dict:
     return active_cloud[0] if active_cloud else {}
 
 
+@functools.cache
 def get_active_llms() -> dict:
-    """Get active LLM providers from the LLM manager."""
+    """Get active LLM providers from the LLM manager.
+
+    Providers are configured at startup, so the result is computed once per process.
+    """
     llm_manager = manager.LLMManager()
     llm_providers = list(llm_manager.get_providers())
     active_llms = [provider_class().to_dict() for _, provider_class in llm_providers]
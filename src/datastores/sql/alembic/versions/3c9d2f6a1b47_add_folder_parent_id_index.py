@@ -0,0 +1,32 @@
+"""Add index on folder parent_id
+
+Revision ID: 3c9d2f6a1b47
+Revises: b7d67e6bb29e
+Create Date: 2026-10-16 09:12:41.381204
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3c9d2f6a1b47"
+down_revision: Union[str, None] = "b7d67e6bb29e"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_folder_parent_id_id_desc",
+        "folder",
+        ["parent_id", sa.text("id DESC")],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_folder_parent_id_id_desc", table_name="folder")
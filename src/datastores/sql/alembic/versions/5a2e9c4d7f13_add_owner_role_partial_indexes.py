@@ -0,0 +1,41 @@
+"""Add partial indexes on owner roles
+
+Revision ID: 5a2e9c4d7f13
+Revises: 8e4b1a7c5d20
+Create Date: 2026-10-16 17:24:08.512936
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5a2e9c4d7f13"
+down_revision: Union[str, None] = "8e4b1a7c5d20"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_userrole_file_id_owner",
+        "userrole",
+        ["file_id"],
+        unique=False,
+        postgresql_where=sa.text("role = 'OWNER'"),
+    )
+    op.create_index(
+        "ix_userrole_folder_id_owner",
+        "userrole",
+        ["folder_id"],
+        unique=False,
+        postgresql_where=sa.text("role = 'OWNER'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_userrole_folder_id_owner", table_name="userrole")
+    op.drop_index("ix_userrole_file_id_owner", table_name="userrole")
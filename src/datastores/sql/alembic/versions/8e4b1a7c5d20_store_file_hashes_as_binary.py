@@ -0,0 +1,46 @@
+"""Store file hashes as binary digests
+
+Revision ID: 8e4b1a7c5d20
+Revises: 3c9d2f6a1b47
+Create Date: 2026-10-16 10:41:07.215390
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8e4b1a7c5d20"
+down_revision: Union[str, None] = "3c9d2f6a1b47"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Column name and hex digest length.
+HASH_COLUMNS = (("hash_md5", 32), ("hash_sha1", 40), ("hash_sha256", 64))
+
+
+def upgrade() -> None:
+    for column_name, hex_length in HASH_COLUMNS:
+        op.alter_column(
+            "file",
+            column_name,
+            existing_type=sa.Unicode(length=hex_length),
+            type_=sa.LargeBinary(length=hex_length // 2),
+            existing_nullable=True,
+            postgresql_using=f"decode({column_name}, 'hex')",
+        )
+
+
+def downgrade() -> None:
+    for column_name, hex_length in HASH_COLUMNS:
+        op.alter_column(
+            "file",
+            column_name,
+            existing_type=sa.LargeBinary(length=hex_length // 2),
+            type_=sa.Unicode(length=hex_length),
+            existing_nullable=True,
+            postgresql_using=f"encode({column_name}, 'hex')",
+        )
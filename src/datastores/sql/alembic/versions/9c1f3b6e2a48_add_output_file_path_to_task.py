@@ -0,0 +1,29 @@
+"""Add output_file_path to Task model
+
+Revision ID: 9c1f3b6e2a48
+Revises: 5a2e9c4d7f13
+Create Date: 2026-10-16 18:02:41.207319
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "9c1f3b6e2a48"
+down_revision: Union[str, None] = "5a2e9c4d7f13"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "task", sa.Column("output_file_path", sa.UnicodeText(), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("task", "output_file_path")
@@ -17,7 +17,7 @@ from functools import wraps
 from typing import Callable
 
 from fastapi import HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 
 from datastores.sql.models.file import File
 from datastores.sql.models.folder import Folder
@@ -150,7 +150,10 @@ def require_access(
                     )
 
             if file_id:
-                file = db.get(File, file_id)
+                # Load the folder with the file, it is needed for inherited
+                # permissions and the file path. The handler's own lookup of the
+                # file is then served from the session's identity map.
+                file = db.get(File, file_id, options=[joinedload(File.folder)])
                 if not file:
                     raise HTTPException(
                         status_code=404, detail="File not found.")
@@ -16,7 +16,8 @@ import os
 import uuid
 
 import magic
-from sqlalchemy.orm import Session
+from sqlalchemy import insert
+from sqlalchemy.orm import Session, joinedload, selectinload
 
 from api.v1 import schemas
 from datastores.sql.models.file import File, FileReport, FileSummary
@@ -36,7 +37,14 @@ def get_files_from_db(db: Session, folder_id: int):
     Returns:
         List[File]: A list of File objects representing the files in the folder.
     """
-    return db.query(File).filter_by(folder_id=folder_id).order_by(File.id.desc()).all()
+    # The listing includes the user of every file, load them in one batch.
+    return (
+        db.query(File)
+        .filter_by(folder_id=folder_id)
+        .options(selectinload(File.user))
+        .order_by(File.id.desc())
+        .all()
+    )
 
 
 def get_file_from_db(db: Session, file_id: int):
@@ -49,7 +57,9 @@ def get_file_from_db(db: Session, file_id: int):
     Returns:
         File: A File object representing the file with the specified ID.
     """
-    return db.get(File, file_id)
+    # The folder is needed for the file path, which nearly every caller uses, so
+    # load it in the same query.
+    return db.get(File, file_id, options=[joinedload(File.folder)])
 
 
 def get_file_by_uuid_from_db(db: Session, uuid_string: str):
@@ -65,22 +75,17 @@ def get_file_by_uuid_from_db(db: Session, uuid_string: str):
     return db.query(File).filter_by(uuid=uuid.UUID(uuid_string)).first()
 
 
-def create_file_in_db(db: Session, file: schemas.FileCreate, current_user: User):
-    """Creates a new file in the database.
+def _set_file_metadata(file: schemas.FileCreate, folder_path: str):
+    """Sets metadata derived from the file on disk.
 
     Args:
-        db (Session): A SQLAlchemy database session object.
-        file (dict): A dictionary representing the file to be created.
-
-    Returns:
-        File: The newly created File object.
+        file (schemas.FileCreate): The file to be created.
+        folder_path (str): Path to the folder containing the file.
     """
-    folder = get_folder_from_db(db, file.folder_id)
-    uuid = file.uuid
-    output_filename = uuid.hex
+    output_filename = file.uuid.hex
     if file.extension:
-        output_filename = f"{uuid.hex}.{file.extension}"
-    output_file = os.path.join(folder.path, output_filename)
+        output_filename = f"{file.uuid.hex}.{file.extension}"
+    output_file = os.path.join(folder_path, output_filename)
 
     # File metadata
     file.magic_text = magic.from_file(output_file)
@@ -90,6 +95,20 @@ def create_file_in_db(db: Session, file: schemas.FileCreate, current_user: User)
     if not file.data_type:
         file.data_type = "file:generic"
 
+
+def create_file_in_db(db: Session, file: schemas.FileCreate, current_user: User):
+    """Creates a new file in the database.
+
+    Args:
+        db (Session): A SQLAlchemy database session object.
+        file (dict): A dictionary representing the file to be created.
+
+    Returns:
+        File: The newly created File object.
+    """
+    folder = get_folder_from_db(db, file.folder_id)
+    _set_file_metadata(file, folder.path)
+
     db_file = File(**file.model_dump())
     db.add(db_file)
     db.commit()
@@ -98,10 +117,48 @@ def create_file_in_db(db: Session, file: schemas.FileCreate, current_user: User)
     user_role = UserRole(user=current_user, file=db_file, role=Role.OWNER)
     db.add(user_role)
     db.commit()
+    # The commit expires the file, reload it so it is returned with its values.
+    db.refresh(db_file)
 
     return db_file
 
 
+def create_files_in_db(
+    db: Session, files: list[schemas.FileCreate], current_user: User
+) -> list[int]:
+    """Creates multiple files in the database using batched inserts.
+
+    Args:
+        db (Session): A SQLAlchemy database session object.
+        files (list): List of files to be created.
+        current_user (User): The user that will own the files.
+
+    Returns:
+        list[int]: IDs of the newly created files, in the same order as the input.
+    """
+    if not files:
+        return []
+
+    for file in files:
+        folder = get_folder_from_db(db, file.folder_id)
+        _set_file_metadata(file, folder.path)
+
+    file_ids = db.scalars(
+        insert(File).returning(File.id, sort_by_parameter_order=True),
+        [file.model_dump() for file in files],
+    ).all()
+    db.execute(
+        insert(UserRole),
+        [
+            {"user_id": current_user.id, "file_id": file_id, "role": Role.OWNER}
+            for file_id in file_ids
+        ],
+    )
+    db.commit()
+
+    return file_ids
+
+
 def delete_file_from_db(db: Session, file_id: int):
     """Delete a file from the database by its ID.
 
@@ -15,10 +15,12 @@
 import os
 import uuid
 
+from sqlalchemy import func, select, update
 from sqlalchemy.orm import Session
 from sqlalchemy.sql import and_
 
 from api.v1 import schemas
+from datastores.sql.models.file import File
 from datastores.sql.models.folder import Folder
 from datastores.sql.models.group import Group, GroupRole
 from datastores.sql.models.role import Role
@@ -99,22 +101,33 @@ def get_shared_folders_from_db(db: Session, current_user: User):
     )
 
 
-def get_subfolders_from_db(db: Session, parent_folder_id: str):
-    """Get all folders in a folder
+def get_subfolders_from_db(
+    db: Session,
+    parent_folder_id: str,
+    cursor: int | None = None,
+    limit: int | None = None,
+):
+    """Get all folders in a folder, newest first.
+
+    Supports keyset pagination: pass the id of the last folder from the previous
+    page as the cursor to get the next page.
 
     Args:
         db (Session): database session
         folder_id (str): folder id
+        cursor (int, optional): only return folders with an id lower than this
+        limit (int, optional): maximum number of folders to return
 
     Returns:
         list: list of folders
     """
-    return (
-        db.query(Folder)
-        .filter_by(parent_id=parent_folder_id)
-        .order_by(Folder.id.desc())
-        .all()
-    )
+    query = db.query(Folder).filter(Folder.parent_id == parent_folder_id)
+    if cursor is not None:
+        query = query.filter(Folder.id < cursor)
+    query = query.order_by(Folder.id.desc())
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
 
 
 def get_folder_from_db(db: Session, folder_id: int):
@@ -151,16 +164,14 @@ def create_root_folder_in_db(
         user=current_user,
         parent_id=None,
     )
-    db.add(new_db_folder)
-    db.commit()
-    db.refresh(new_db_folder)
-
     user_role = UserRole(user=current_user, folder=new_db_folder, role=Role.OWNER)
-    db.add(user_role)
+    db.add_all([new_db_folder, user_role])
+
+    # The path only depends on the UUID, resolve it before the commit expires it.
+    folder_path = new_db_folder.path
     db.commit()
 
-    if not os.path.exists(new_db_folder.path):
-        os.mkdir(new_db_folder.path)
+    os.makedirs(folder_path, exist_ok=True)
 
     return new_db_folder
 
@@ -188,16 +199,14 @@ def create_subfolder_in_db(
         user=current_user,
         parent_id=folder_id,
     )
-    db.add(new_db_folder)
-    db.commit()
-    db.refresh(new_db_folder)
-
     user_role = UserRole(user=current_user, folder=new_db_folder, role=Role.OWNER)
-    db.add(user_role)
+    db.add_all([new_db_folder, user_role])
+
+    # The path only depends on the UUID, resolve it before the commit expires it.
+    folder_path = new_db_folder.path
     db.commit()
 
-    if not os.path.exists(new_db_folder.path):
-        os.mkdir(new_db_folder.path)
+    os.makedirs(folder_path, exist_ok=True)
 
     return new_db_folder
 
@@ -212,12 +221,16 @@ def update_folder_in_db(db: Session, folder: schemas.FolderUpdateRequest):
     Returns:
         Folder object
     """
-    folder_in_db = db.get(Folder, folder.id)
-    folder_dict = folder.model_dump()
-    for key, value in folder_dict.items():
-        setattr(folder_in_db, key, value) if value else None
+    # Timestamps are managed by the database and the id is used for the lookup.
+    values = {
+        key: value
+        for key, value in folder.model_dump().items()
+        if value and key not in ("id", "created_at", "updated_at")
+    }
+    folder_in_db = db.execute(
+        update(Folder).where(Folder.id == folder.id).values(**values).returning(Folder)
+    ).scalar_one()
     db.commit()
-    db.refresh(folder_in_db)
     return folder_in_db
 
 
@@ -228,17 +241,28 @@ def delete_folder_from_db(db: Session, folder_id: int):
         db (Session): A SQLAlchemy database session object.
         folder_id (int): The ID of the folder to be deleted.
     """
-    folder = db.get(Folder, folder_id)
-
-    def _recursive_soft_delete(folder: Folder):
-        """Recursive function to delete all files and subfolders."""
-        for file in folder.files:
-            file.soft_delete(db)
-
-        for child_folder in folder.children:
-            _recursive_soft_delete(child_folder)
-
-        folder.soft_delete(db)
-
-    _recursive_soft_delete(folder)
+    # Collect the folder and all of its subfolders with a recursive CTE.
+    folder_tree = (
+        select(Folder.id)
+        .where(Folder.id == folder_id)
+        .cte(name="folder_tree", recursive=True)
+    )
+    folder_tree = folder_tree.union_all(
+        select(Folder.id).where(Folder.parent_id == folder_tree.c.id)
+    )
+    folder_ids = select(folder_tree.c.id)
+
+    # Soft delete all files and folders in the tree with one statement each.
+    db.execute(
+        update(File)
+        .where(File.folder_id.in_(folder_ids), File.is_deleted.is_not(True))
+        .values(is_deleted=True, deleted_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(
+        update(Folder)
+        .where(Folder.id.in_(folder_ids), Folder.is_deleted.is_not(True))
+        .values(is_deleted=True, deleted_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
     db.commit()
@@ -14,11 +14,11 @@
 
 import uuid
 
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import Session
 
 from api.v1 import schemas
-from datastores.sql.models.group import Group, GroupRole
-from datastores.sql.models.user import User
+from datastores.sql.models.group import Group, GroupRole, group_user_association_table
 
 
 def get_groups_from_db(db: Session):
@@ -72,7 +72,7 @@ def create_group_in_db(db: Session, new_group: schemas.GroupCreate):
     new_db_group = Group(
         name=new_group.name,
         description=new_group.description,
-        uuid=uuid.uuid4().hex,
+        uuid=uuid.uuid4(),
     )
     db.add(new_db_group)
     db.commit()
@@ -80,17 +80,23 @@ def create_group_in_db(db: Session, new_group: schemas.GroupCreate):
     return new_db_group
 
 
-def add_user_to_group(db: Session, group: Group, user: User):
-    """Add a user to a group.
+def add_users_to_group(db: Session, group: Group, user_ids: list[int]):
+    """Add multiple users to a group in a single transaction.
+
+    Membership rows are inserted directly so the group's users collection is never
+    loaded. Users that already are members are skipped.
 
     Args:
         db: SQLAlchemy session
-        group_id: Group id
-        user_id: User id
+        group: Group object
+        user_ids: List of user ids
     """
-    group.users.append(user)
+    if user_ids:
+        db.execute(
+            insert(group_user_association_table).on_conflict_do_nothing(),
+            [{"group_id": group.id, "user_id": user_id} for user_id in user_ids],
+        )
     db.commit()
-    db.refresh(group)
 
 
 def search_groups(db: Session, search_string: str):
@@ -94,7 +94,8 @@ def create_user_in_db(db: Session, new_user: schemas.UserCreate):
     Returns:
         User object
     """
-    new_db_user = User(
+    return create_user_row_in_db(
+        db,
         display_name=new_user.display_name,
         username=new_user.username,
         password_hash=new_user.password_hash,
@@ -108,6 +109,22 @@ def create_user_in_db(db: Session, new_user: schemas.UserCreate):
         is_robot=new_user.is_robot,
     )
 
+
+def create_user_row_in_db(db: Session, **fields):
+    """Create a user in the database from already validated column values.
+
+    This skips the schema validation of create_user_in_db and is meant for trusted
+    callers, such as the admin CLI.
+
+    Args:
+        db: SQLAlchemy session
+        **fields: User column values
+
+    Returns:
+        User object
+    """
+    new_db_user = User(**fields)
+
     # Add user to system (everyone) group
     everyone_group = get_group_by_name_from_db(db, "Everyone")
     if not everyone_group:
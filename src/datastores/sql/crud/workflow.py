@@ -14,8 +14,10 @@
 
 import uuid
 
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.orm import Session, joinedload, selectinload
 
+from datastores.sql.models.file import File
 from datastores.sql.models.workflow import Workflow, Task, WorkflowTemplate
 from api.v1 import schemas
 
@@ -62,7 +64,11 @@ def get_workflow_from_db(db: Session, workflow_id: int):
     Returns:
         Workflow object
     """
-    return db.get(Workflow, workflow_id)
+    return db.get(
+        Workflow,
+        workflow_id,
+        options=[joinedload(Workflow.folder), joinedload(Workflow.user)],
+    )
 
 
 def create_workflow_in_db(db: Session, workflow: schemas.Workflow, template_id: int):
@@ -75,13 +81,27 @@ def create_workflow_in_db(db: Session, workflow: schemas.Workflow, template_id:
 
     Returns:
         Workflow object
+
+    Raises:
+        ValueError: If any of the input files does not exist.
     """
+    # Keep the order of the input files, without duplicates.
+    file_ids = list(dict.fromkeys(workflow.file_ids))
+    # Load all input files, and the folders used to build their paths, in batches
+    # instead of one query per file.
+    files = db.scalars(
+        select(File).where(File.id.in_(file_ids)).options(selectinload(File.folder))
+    )
+    files_by_id = {file.id: file for file in files}
+    if missing_file_ids := [i for i in file_ids if i not in files_by_id]:
+        raise ValueError(f"Files not found: {missing_file_ids}")
+
     db_workflow = Workflow(
         display_name=workflow.display_name,
         description=workflow.description,
         spec_json=workflow.spec_json,
         uuid=uuid.uuid4(),
-        files=[get_file_from_db(db, file_id) for file_id in workflow.file_ids],
+        files=[files_by_id[file_id] for file_id in file_ids],
         folder_id=workflow.folder_id,
         user_id=workflow.user_id,
     )
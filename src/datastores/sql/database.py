@@ -58,7 +58,24 @@ if SQLALCHEMY_DATABASE_URL_ENV:
 #    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 # )
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# Connection pool settings. The defaults allow for 30 concurrent connections per
+# process, and connections are verified and recycled to survive idle timeouts.
+SQLALCHEMY_POOL_SIZE = int(config["datastores"]["sqlalchemy"].get("pool_size", 20))
+SQLALCHEMY_MAX_OVERFLOW = int(
+    config["datastores"]["sqlalchemy"].get("max_overflow", 10)
+)
+SQLALCHEMY_POOL_RECYCLE = int(
+    config["datastores"]["sqlalchemy"].get("pool_recycle", 1800)
+)
+
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    pool_size=SQLALCHEMY_POOL_SIZE,
+    max_overflow=SQLALCHEMY_MAX_OVERFLOW,
+    pool_pre_ping=True,
+    pool_recycle=SQLALCHEMY_POOL_RECYCLE,
+    pool_use_lifo=True,
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=True, bind=engine)
 
 
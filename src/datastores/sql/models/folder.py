@@ -15,8 +15,7 @@ import os
 import uuid as uuid_module
 from typing import TYPE_CHECKING, List, Optional
 
-from sqlalchemy import UUID, BigInteger, ForeignKey, Integer, UnicodeText
-from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy import UUID, BigInteger, ForeignKey, Index, Integer, UnicodeText, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from config import config
@@ -29,6 +28,9 @@ if TYPE_CHECKING:
     from datastores.sql.models.user import User, UserRole
     from datastores.sql.models.group import GroupRole
 
+# Root directory for all folders on disk. Static after startup.
+_BASE_STORAGE_PATH = config["server"]["storage_path"]
+
 
 class Folder(BaseModel):
     """Represents a folder in the database.
@@ -46,6 +48,11 @@ class Folder(BaseModel):
         children: The children folders.
     """
 
+    # Subfolder listings filter on parent_id and sort by id, newest first.
+    __table_args__ = (
+        Index("ix_folder_parent_id_id_desc", "parent_id", text("id DESC")),
+    )
+
     display_name: Mapped[str] = mapped_column(UnicodeText, index=True)
     description: Mapped[Optional[str]] = mapped_column(UnicodeText, index=False)
     uuid: Mapped[uuid_module.UUID] = mapped_column(UUID(as_uuid=True))
@@ -77,11 +84,10 @@ class Folder(BaseModel):
     )
     children: Mapped[List["Folder"]] = relationship("Folder", back_populates="parent")
 
-    @hybrid_property
+    @property
     def path(self):
         """Returns the full path of the folder."""
-        base_storage_path = config.get("server").get("storage_path")
-        return os.path.join(base_storage_path, self.uuid.hex)
+        return os.path.join(_BASE_STORAGE_PATH, self.uuid.hex)
 
 
 class FolderAttribute(BaseModel, AttributeMixin):
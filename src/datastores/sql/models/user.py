@@ -14,7 +14,17 @@
 import uuid as uuid_module
 from typing import TYPE_CHECKING, List, Optional
 
-from sqlalchemy import UUID, Boolean, DateTime, Enum, ForeignKey, Unicode, UnicodeText
+from sqlalchemy import (
+    UUID,
+    Boolean,
+    DateTime,
+    Enum,
+    ForeignKey,
+    Index,
+    Unicode,
+    UnicodeText,
+    text,
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from ..database import BaseModel
@@ -108,6 +118,21 @@ class UserRole(BaseModel):
     file_id: Mapped[Optional[int]] = mapped_column(ForeignKey("file.id"), nullable=True)
     file: Mapped[Optional["File"]] = relationship(back_populates="user_roles")
 
+    # Partial indexes for finding the owner of a file or folder, used when looking
+    # for files and folders without an owner.
+    __table_args__ = (
+        Index(
+            "ix_userrole_file_id_owner",
+            "file_id",
+            postgresql_where=text("role = 'OWNER'"),
+        ),
+        Index(
+            "ix_userrole_folder_id_owner",
+            "folder_id",
+            postgresql_where=text("role = 'OWNER'"),
+        ),
+    )
+
 
 class UserApiKey(BaseModel):
     """Represents an API key associated with a user.
@@ -66,6 +66,8 @@ class Task(BaseModel):
     status_detail: Mapped[Optional[str]] = mapped_column(UnicodeText, index=False)
     status_progress: Mapped[Optional[str]] = mapped_column(UnicodeText, index=False)
     result: Mapped[Optional[str]] = mapped_column(UnicodeText, index=False)
+    # Copied from the result, so it can be read without parsing the result JSON.
+    output_file_path: Mapped[Optional[str]] = mapped_column(UnicodeText, index=False)
     runtime: Mapped[Optional[float]] = mapped_column(index=False)
     error_exception: Mapped[Optional[str]] = mapped_column(UnicodeText, index=False)
     error_traceback: Mapped[Optional[str]] = mapped_column(UnicodeText, index=False)
@@ -0,0 +1,58 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+def create_executor(name: str, max_workers: int) -> ThreadPoolExecutor:
+    """Creates the executor for one kind of background job.
+
+    Each kind of job has its own executor, so slow jobs such as LLM calls do not
+    hold up other jobs, and the number of concurrent jobs of each kind is bounded.
+
+    Args:
+        name (str): Name of the job, used as the thread name prefix.
+        max_workers (int): Maximum number of jobs run concurrently.
+
+    Returns:
+        ThreadPoolExecutor: The executor.
+    """
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+
+
+def _report_failure(future: Future, job_name: str):
+    """Prints the error if a background job failed."""
+    if future.exception():
+        print(f"Background job {job_name} failed: {future.exception()}")
+
+
+def submit_background(executor: ThreadPoolExecutor, fn, *args, **kwargs) -> Future:
+    """Schedules a function on a background executor and reports failures.
+
+    Background jobs run on their own executors, so they never block the caller or
+    take up the threads that serve API requests. Nobody waits for the result, so
+    errors are printed when the job fails.
+
+    Args:
+        executor (ThreadPoolExecutor): The executor to run the job on.
+        fn (Callable): The function to run.
+        *args: Positional arguments for fn.
+        **kwargs: Keyword arguments for fn.
+
+    Returns:
+        Future: The scheduled job.
+    """
+    future = executor.submit(fn, *args, **kwargs)
+    future.add_done_callback(lambda done: _report_failure(done, fn.__name__))
+    return future
@@ -15,6 +15,31 @@
 import ast
 import re
 
+# Seconds between health checks of idle Redis connections. Connections dropped by
+# an idle timeout are then reconnected before use instead of failing a request.
+REDIS_HEALTH_CHECK_INTERVAL = 30
+
+# Maximum number of connections in each Redis connection pool.
+REDIS_MAX_CONNECTIONS = 64
+
+
+def configure_redis_connections(celery_instance):
+    """Configures the Redis connection pools of the broker and result backend.
+
+    Args:
+        celery_instance (Celery): A celery instance.
+    """
+    celery_instance.conf.update(
+        broker_transport_options={
+            "health_check_interval": REDIS_HEALTH_CHECK_INTERVAL,
+            "max_connections": REDIS_MAX_CONNECTIONS,
+            "socket_keepalive": True,
+        },
+        redis_backend_health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+        redis_max_connections=REDIS_MAX_CONNECTIONS,
+        redis_socket_keepalive=True,
+    )
+
 
 def get_registered_tasks(celery_instance):
     """Get a list of registered celery tasks.
@@ -0,0 +1,302 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from concurrent.futures import ThreadPoolExecutor
+import contextlib
+import errno
+import io
+import os
+import queue
+import shutil
+
+# Maximum number of bytes handed to a single sendfile call.
+SENDFILE_MAX_BYTES = 1 << 30  # 1GB
+
+# Size of the reads when copying from a file object.
+COPY_BUFFER_SIZE = 1 << 20  # 1MB
+
+# Maximum number of files copied concurrently when concatenating files.
+CONCATENATE_MAX_WORKERS = 16
+
+# Errors from copy_file_range that mean the file system does not support it.
+COPY_FILE_RANGE_UNSUPPORTED_ERRORS = (errno.ENOSYS, errno.EXDEV, errno.EOPNOTSUPP)
+
+# Maximum number of idle copy buffers kept for reuse.
+COPY_BUFFER_POOL_SIZE = 16
+
+# Reusable copy buffers, shared by the worker threads.
+_copy_buffer_pool = queue.SimpleQueue()
+
+
+@contextlib.contextmanager
+def _copy_buffer():
+    """Yields a copy buffer from the pool, allocating one if none are idle."""
+    try:
+        buffer = _copy_buffer_pool.get_nowait()
+    except queue.Empty:
+        buffer = bytearray(COPY_BUFFER_SIZE)
+    try:
+        yield buffer
+    finally:
+        if _copy_buffer_pool.qsize() < COPY_BUFFER_POOL_SIZE:
+            _copy_buffer_pool.put(buffer)
+
+
+def _copy_fd(out_fd, in_fd, size, in_offset=0):
+    """Copies size bytes from in_fd to the current position of out_fd.
+
+    Uses sendfile so the data is copied by the kernel, without passing through
+    userspace buffers.
+
+    Args:
+        out_fd (int): File descriptor to write to.
+        in_fd (int): File descriptor to read from.
+        size (int): Number of bytes to copy.
+        in_offset (int): Offset in in_fd to start copying from.
+
+    Returns:
+        int: Number of bytes copied.
+    """
+    offset = 0
+    while offset < size:
+        count = min(size - offset, SENDFILE_MAX_BYTES)
+        sent = os.sendfile(out_fd, in_fd, in_offset + offset, count)
+        if not sent:
+            break
+        offset += sent
+    return offset
+
+
+def _get_source_fd(source):
+    """Returns the file descriptor of a file object backed by a file on disk.
+
+    Args:
+        source: Binary file object.
+
+    Returns:
+        int: The file descriptor, or None if sendfile can not read from the source.
+    """
+    if not hasattr(os, "sendfile"):
+        return None
+    # A SpooledTemporaryFile that is still in memory would be written to disk by
+    # fileno(), which costs more than copying it through a buffer.
+    if getattr(source, "_rolled", True) is False:
+        return None
+    try:
+        return source.fileno()
+    except (AttributeError, io.UnsupportedOperation):
+        return None
+
+
+def _copy_source_fd(out_fd, source, source_fd):
+    """Copies the rest of a file object to the current position of out_fd.
+
+    Args:
+        out_fd (int): File descriptor to write to.
+        source: Binary file object to read from.
+        source_fd (int): File descriptor of the source.
+
+    Returns:
+        int: Number of bytes copied.
+    """
+    # Buffered writes to the source must reach the file before it is copied.
+    source.flush()
+    start = source.tell()
+    size = os.fstat(source_fd).st_size - start
+    copied = _copy_fd(out_fd, source_fd, size, start)
+    source.seek(start + copied)
+    return copied
+
+
+def _copy_to_offset(out_fd, input_path, out_offset):
+    """Copies a whole file to an offset in out_fd with copy_file_range.
+
+    Args:
+        out_fd (int): File descriptor to write to.
+        input_path (str): Path of the file to copy.
+        out_offset (int): Offset in out_fd to write the file to.
+    """
+    with open(input_path, "rb") as infile:
+        in_fd = infile.fileno()
+        size = os.fstat(in_fd).st_size
+        offset = 0
+        while offset < size:
+            copied = os.copy_file_range(
+                in_fd, out_fd, size - offset, offset, out_offset + offset
+            )
+            if not copied:
+                break
+            offset += copied
+
+
+def _concatenate_files_parallel(output_path, input_paths):
+    """Concatenates files by copying them to their offsets concurrently.
+
+    The offset of each file follows from the sizes of the files before it, so the
+    files are independent and the kernel can reorder and merge the I/O.
+
+    Args:
+        output_path (str): Path of the file to create.
+        input_paths (list[str]): Paths of the files to concatenate, in order.
+    """
+    sizes = [os.stat(input_path).st_size for input_path in input_paths]
+    offsets = [0]
+    for size in sizes[:-1]:
+        offsets.append(offsets[-1] + size)
+
+    with open(output_path, "wb") as outfile:
+        out_fd = outfile.fileno()
+        if hasattr(os, "posix_fallocate") and sum(sizes):
+            os.posix_fallocate(out_fd, 0, sum(sizes))
+        with ThreadPoolExecutor(max_workers=CONCATENATE_MAX_WORKERS) as executor:
+            futures = [
+                executor.submit(_copy_to_offset, out_fd, input_path, offset)
+                for input_path, offset in zip(input_paths, offsets)
+            ]
+            for future in futures:
+                future.result()
+
+
+def _concatenate_files_sequential(output_path, input_paths):
+    """Concatenates files by appending them to the output one by one.
+
+    The files are copied in-kernel with sendfile where supported, with a regular
+    buffered copy as fallback.
+
+    Args:
+        output_path (str): Path of the file to create.
+        input_paths (list[str]): Paths of the files to concatenate, in order.
+    """
+    use_sendfile = hasattr(os, "sendfile")
+    with open(output_path, "wb") as outfile:
+        for input_path in input_paths:
+            with open(input_path, "rb") as infile:
+                if use_sendfile:
+                    size = os.fstat(infile.fileno()).st_size
+                    _copy_fd(outfile.fileno(), infile.fileno(), size)
+                else:
+                    shutil.copyfileobj(infile, outfile)
+
+
+def concatenate_files(output_path, input_paths, remove_inputs=False):
+    """Concatenates files into a new output file.
+
+    Where copy_file_range is supported the files are copied concurrently to their
+    offsets in the output, otherwise they are appended one by one. This is
+    blocking, so call it with asyncio.to_thread from async code.
+
+    Args:
+        output_path (str): Path of the file to create.
+        input_paths (Iterable[str]): Paths of the files to concatenate, in order.
+        remove_inputs (bool): Remove the input files once they have been copied.
+    """
+    input_paths = list(input_paths)
+    if len(input_paths) > 1 and hasattr(os, "copy_file_range"):
+        try:
+            _concatenate_files_parallel(output_path, input_paths)
+        except OSError as e:
+            if e.errno not in COPY_FILE_RANGE_UNSUPPORTED_ERRORS:
+                raise
+            _concatenate_files_sequential(output_path, input_paths)
+    else:
+        _concatenate_files_sequential(output_path, input_paths)
+
+    if remove_inputs:
+        for input_path in input_paths:
+            os.remove(input_path)
+
+
+def save_file(path, source):
+    """Writes the contents of a file object to a new file.
+
+    Args:
+        path (str): Path of the file to create, an existing file is replaced.
+        source: Binary file object to read from.
+    """
+    source_fd = _get_source_fd(source)
+    with open(path, "wb") as outfile:
+        # Uploads spooled to disk are copied in-kernel.
+        if source_fd is not None:
+            _copy_source_fd(outfile.fileno(), source, source_fd)
+            return
+        with _copy_buffer() as buffer:
+            view = memoryview(buffer)
+            while bytes_read := source.readinto(buffer):
+                outfile.write(view[:bytes_read])
+
+
+def _write_buffered(fd, source, offset, hashers):
+    """Writes a file object to an offset in fd through a pooled buffer.
+
+    Args:
+        fd (int): File descriptor to write to.
+        source: Binary file object to read from.
+        offset (int): Offset in fd to start writing at.
+        hashers (Iterable): Hash objects updated with the written data.
+
+    Returns:
+        int: The offset after the written data.
+    """
+    with _copy_buffer() as buffer:
+        while bytes_read := source.readinto(buffer):
+            view = memoryview(buffer)[:bytes_read]
+            for hasher in hashers:
+                hasher.update(view)
+            while view:
+                bytes_written = os.pwrite(fd, view, offset)
+                offset += bytes_written
+                view = view[bytes_written:]
+    return offset
+
+
+def write_at_offset(
+    path, source, offset, total_size=None, hashers=(), drop_cache=False
+):
+    """Writes the contents of a file object into a file at the given offset.
+
+    The file is created if it does not exist. Other parts of the file are left
+    untouched, so chunks of the same file can be written in any order.
+
+    Args:
+        path (str): Path of the file to write to.
+        source: Binary file object to read from.
+        offset (int): Offset in the file to start writing at.
+        total_size (int): Optional final size of the file, used to reserve the disk
+            space for the whole file up front.
+        hashers (Iterable): Optional hash objects updated with the written data.
+        drop_cache (bool): Flush the written range and drop it from the page cache,
+            so writing large files does not evict data that is read more often.
+    """
+    start_offset = offset
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT, 0o644)
+    try:
+        if total_size and hasattr(os, "posix_fallocate"):
+            os.posix_fallocate(fd, 0, total_size)
+        source_fd = None if hashers else _get_source_fd(source)
+        if source_fd is not None:
+            # Uploads spooled to disk are copied in-kernel, unless the data is
+            # needed for hashing.
+            os.lseek(fd, offset, os.SEEK_SET)
+            offset += _copy_source_fd(fd, source, source_fd)
+        else:
+            # Read into a reused buffer instead of allocating new bytes per read.
+            offset = _write_buffered(fd, source, offset, hashers)
+        # Only clean pages can be dropped, so the range is flushed first.
+        if drop_cache and hasattr(os, "posix_fadvise"):
+            os.fdatasync(fd)
+            os.posix_fadvise(
+                fd, start_offset, offset - start_offset, os.POSIX_FADV_DONTNEED
+            )
+    finally:
+        os.close(fd)
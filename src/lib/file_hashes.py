@@ -12,20 +12,149 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import mmap
+import os
+
 from datastores.sql import database
 from datastores.sql.crud.file import get_file_from_db
+from lib.background import create_executor, submit_background
 
-import hashlib
+# Size of the reusable read buffer used when hashing files.
+HASH_BUFFER_SIZE = 1 << 20  # 1MB
+
+# Files larger than this are hashed with one thread per algorithm. hashlib releases
+# the GIL while hashing, so the algorithms run in parallel on separate cores.
+PARALLEL_HASH_THRESHOLD = 8 * 1024 * 1024  # 8MB
+
+HASH_ALGORITHMS = ("md5", "sha1", "sha256")
+
+# Number of files hashed concurrently in the background.
+MAX_HASH_WORKERS = 4
+
+_hash_executor = create_executor("generate_hashes", MAX_HASH_WORKERS)
+
+
+def _new_hasher(algorithm):
+    """Returns a new hash object for the algorithm."""
+    return hashlib.new(algorithm, usedforsecurity=False)
+
+
+def new_hashers():
+    """Returns a new hash object per algorithm in HASH_ALGORITHMS.
+
+    Returns:
+        dict: Hash object per algorithm.
+    """
+    return {algorithm: _new_hasher(algorithm) for algorithm in HASH_ALGORITHMS}
+
+
+def _hash_file_single_pass(path):
+    """Hashes a file with all algorithms while reading it only once.
+
+    Args:
+        path (str): Path to the file.
+
+    Returns:
+        dict: Digest per algorithm.
+    """
+    hashers = new_hashers()
+    buffer = bytearray(HASH_BUFFER_SIZE)
+    view = memoryview(buffer)
+    with open(path, "rb") as fh:
+        while bytes_read := fh.readinto(buffer):
+            chunk = view[:bytes_read]
+            for hasher in hashers.values():
+                hasher.update(chunk)
+    return {algorithm: hasher.digest() for algorithm, hasher in hashers.items()}
+
+
+def _hash_buffer(buffer, algorithm):
+    """Hashes a buffer with a single algorithm.
+
+    Args:
+        buffer: Object supporting the buffer protocol, e.g. an mmap.
+        algorithm (str): Name of the hash algorithm.
+
+    Returns:
+        bytes: Digest of the buffer.
+    """
+    hasher = _new_hasher(algorithm)
+    hasher.update(buffer)
+    return hasher.digest()
+
+
+def _hash_file_parallel(path):
+    """Hashes a file with one worker thread per algorithm.
+
+    The file is memory mapped once and shared by all threads, so the data is read
+    straight from the page cache without copying it into Python buffers.
+
+    Args:
+        path (str): Path to the file.
+
+    Returns:
+        dict: Digest per algorithm.
+    """
+    with open(path, "rb") as fh, mmap.mmap(
+        fh.fileno(), 0, access=mmap.ACCESS_READ
+    ) as mapped_file:
+        with ThreadPoolExecutor(max_workers=len(HASH_ALGORITHMS)) as executor:
+            futures = {
+                algorithm: executor.submit(_hash_buffer, mapped_file, algorithm)
+                for algorithm in HASH_ALGORITHMS
+            }
+            return {algorithm: future.result() for algorithm, future in futures.items()}
+
+
+def hash_file(path):
+    """Calculates the MD5, SHA1 and SHA256 digests of a file.
+
+    Small files are hashed in a single pass, large files are hashed in parallel.
+
+    Args:
+        path (str): Path to the file.
+
+    Returns:
+        dict: Digest per algorithm.
+    """
+    if os.stat(path).st_size > PARALLEL_HASH_THRESHOLD:
+        return _hash_file_parallel(path)
+    return _hash_file_single_pass(path)
 
 
 def generate_hashes(file_id):
+    """Calculates and stores the hashes for a file.
+
+    This opens its own database session so it can run outside of the caller's
+    thread, e.g. in a background executor.
+
+    Args:
+        file_id (int): ID of the file to hash.
+    """
     db = database.SessionLocal()
-    file = get_file_from_db(db, file_id)
-    with open(file.path, "rb") as fh:
-        md5 = hashlib.file_digest(fh, "md5").hexdigest()
-        sha1 = hashlib.file_digest(fh, "sha1").hexdigest()
-        sha256 = hashlib.file_digest(fh, "sha256").hexdigest()
-    file.hash_md5 = md5
-    file.hash_sha1 = sha1
-    file.hash_sha256 = sha256
-    db.commit()
+    try:
+        file = get_file_from_db(db, file_id)
+        # Hashes may already be set, e.g. when they were calculated during upload.
+        if file.hash_md5 and file.hash_sha1 and file.hash_sha256:
+            return
+        hashes = hash_file(file.path)
+        file.hash_md5 = hashes["md5"]
+        file.hash_sha1 = hashes["sha1"]
+        file.hash_sha256 = hashes["sha256"]
+        db.commit()
+    finally:
+        db.close()
+
+
+def generate_hashes_in_background(file_id):
+    """Schedules generate_hashes for a file on the background hash executor.
+
+    Args:
+        file_id (int): ID of the file to hash.
+
+    Returns:
+        Future: The scheduled hash job.
+    """
+    return submit_background(_hash_executor, generate_hashes, file_id)
@@ -20,8 +20,14 @@ from datastores.sql.crud.file import (
     get_file_summary_from_db,
     update_file_summary_in_db,
 )
+from lib.background import create_executor, submit_background
 from openrelik_ai_common.providers import manager
 
+# Number of summaries generated concurrently in the background.
+MAX_SUMMARY_WORKERS = 2
+
+_summary_executor = create_executor("generate_summary", MAX_SUMMARY_WORKERS)
+
 SYSTEM_INSTRUCTION = """
 I'm security engineer and I'm investigating a system and need your help analyzing a digital artifact file.
 I'll provide the artifact separately. Focus on identifying any **interesting content** within the file that
@@ -112,3 +118,27 @@ def generate_summary(
     file_summary.status_short = "complete"
     file_summary.runtime = duration.seconds
     file_summary = update_file_summary_in_db(db, file_summary)
+
+
+def generate_summary_in_background(
+    llm_provider: str, llm_model: str, file_id: int, file_summary_id: int
+):
+    """Schedules generate_summary on the background summary executor.
+
+    Args:
+        llm_provider (str): The name of the LLM provider to use.
+        llm_model (str): The name of the model to use.
+        file_id (int): The ID of the file to generate the summary for.
+        file_summary_id (int): The ID of the file summary to update.
+
+    Returns:
+        Future: The scheduled summary job.
+    """
+    return submit_background(
+        _summary_executor,
+        generate_summary,
+        llm_provider,
+        llm_model,
+        file_id,
+        file_summary_id,
+    )
@@ -0,0 +1,185 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+
+from argon2 import PasswordHasher, Parameters, Type, profiles
+
+from config import config
+
+# Default Argon2id cost parameters, the second recommended option in RFC 9106
+# (t=3, m=64MiB, p=4), which is meant for memory constrained hosts. Each lane is
+# hashed on its own thread. The parallelism is fixed rather than derived from the
+# CPU count, because check_needs_rehash compares it too. Hosts with different core
+# counts would otherwise keep rehashing each other's passwords.
+ARGON2_DEFAULT_TIME_COST = 3
+ARGON2_DEFAULT_MEMORY_COST = 65536  # KiB
+ARGON2_DEFAULT_PARALLELISM = 4
+
+# Named parameter profiles that can be selected in the config.
+ARGON2_PROFILES = {
+    "rfc9106_low": profiles.RFC_9106_LOW_MEMORY,
+    "rfc9106_high": profiles.RFC_9106_HIGH_MEMORY,
+    "owasp": Parameters(
+        type=Type.ID,
+        version=19,
+        salt_len=16,
+        hash_len=32,
+        time_cost=2,
+        memory_cost=19456,
+        parallelism=1,
+    ),
+}
+
+# Upper bound for the time cost when calibrating, to stop on very fast hosts.
+ARGON2_MAX_TIME_COST = 64
+
+# Precision of the memory cost when calibrating.
+ARGON2_MEMORY_COST_STEP = 1024  # KiB
+
+
+def get_password_hasher(argon2_config: dict) -> PasswordHasher:
+    """Creates an Argon2id password hasher from configuration.
+
+    A named profile can be selected with the "profile" key, individual time_cost,
+    memory_cost and parallelism keys override the profile values:
+        rfc9106_low: RFC 9106 second recommended option (t=3, m=64MiB, p=4),
+            for memory constrained hosts.
+        rfc9106_high: RFC 9106 first recommended option (t=1, m=2GiB, p=4).
+        owasp: OWASP minimum recommendation (t=2, m=19MiB, p=1).
+
+    Without a profile the module defaults are used. The parameters are encoded in
+    every hash, so hashes created with other parameters can still be verified
+    after the configuration changes.
+
+    Args:
+        argon2_config (dict): The [auth.argon2] section of the config.
+
+    Returns:
+        PasswordHasher: The configured password hasher.
+    """
+    parameters = {
+        "time_cost": ARGON2_DEFAULT_TIME_COST,
+        "memory_cost": ARGON2_DEFAULT_MEMORY_COST,
+        "parallelism": ARGON2_DEFAULT_PARALLELISM,
+    }
+    if profile_name := argon2_config.get("profile"):
+        profile = ARGON2_PROFILES[profile_name]
+        parameters = {
+            "time_cost": profile.time_cost,
+            "memory_cost": profile.memory_cost,
+            "parallelism": profile.parallelism,
+        }
+    for name in parameters:
+        if name in argon2_config:
+            parameters[name] = argon2_config[name]
+    return PasswordHasher(**parameters)
+
+
+def _time_hash_ms(time_cost: int, memory_cost: int, parallelism: int) -> float:
+    """Measures how long hashing a password takes with the given parameters.
+
+    Args:
+        time_cost (int): Number of iterations.
+        memory_cost (int): Memory usage in KiB.
+        parallelism (int): Number of lanes.
+
+    Returns:
+        float: Wall time in milliseconds.
+    """
+    hasher = PasswordHasher(
+        time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism
+    )
+    start = time.perf_counter_ns()
+    hasher.hash("benchmark")
+    return (time.perf_counter_ns() - start) / 1_000_000
+
+
+def calibrate_time_cost(target_ms: int, memory_cost: int, parallelism: int) -> int:
+    """Finds the lowest time cost that makes hashing take at least target_ms.
+
+    The time cost is doubled until the target is overshot, then the exact value
+    is found with a binary search between the last two candidates.
+
+    Args:
+        target_ms (int): Target hashing time in milliseconds.
+        memory_cost (int): Memory usage in KiB.
+        parallelism (int): Number of lanes.
+
+    Returns:
+        int: The calibrated time cost.
+    """
+    low, high = 0, 1
+    while _time_hash_ms(high, memory_cost, parallelism) < target_ms:
+        if high >= ARGON2_MAX_TIME_COST:
+            return ARGON2_MAX_TIME_COST
+        low, high = high, min(high * 2, ARGON2_MAX_TIME_COST)
+
+    # The target is reached at high but not at low.
+    while high - low > 1:
+        middle = (low + high) // 2
+        if _time_hash_ms(middle, memory_cost, parallelism) < target_ms:
+            low = middle
+        else:
+            high = middle
+    return high
+
+
+def calibrate_memory_cost(
+    target_ms: int, min_memory_cost: int, max_memory_cost: int, parallelism: int
+) -> int:
+    """Finds the highest memory cost for which a single pass stays within target_ms.
+
+    Following RFC 9106, memory is the preferred cost to raise. The memory cost is
+    doubled while a hash with time_cost=1 stays within the target, then refined
+    with a binary search in steps of ARGON2_MEMORY_COST_STEP.
+
+    Args:
+        target_ms (int): Target hashing time in milliseconds.
+        min_memory_cost (int): Lowest memory cost to consider in KiB.
+        max_memory_cost (int): Highest memory cost to consider in KiB.
+        parallelism (int): Number of lanes.
+
+    Returns:
+        int: The calibrated memory cost in KiB.
+    """
+    low, high = min_memory_cost, min_memory_cost
+    while _time_hash_ms(1, high, parallelism) <= target_ms:
+        if high >= max_memory_cost:
+            return max_memory_cost
+        low, high = high, min(high * 2, max_memory_cost)
+    if low == high:
+        return min_memory_cost
+
+    # The target is kept at low but exceeded at high.
+    while high - low > ARGON2_MEMORY_COST_STEP:
+        middle = (low + high) // 2
+        if _time_hash_ms(1, middle, parallelism) <= target_ms:
+            low = middle
+        else:
+            high = middle
+    return low
+
+
+_argon2_config = config["auth"].get("argon2", {})
+
+# Stored hashes are only upgraded on login when the parameters are configured
+# explicitly. Otherwise a change of the built-in defaults, or hosts running
+# different versions, would add a rehash and a database write to every login.
+REHASH_ON_LOGIN = any(
+    key in _argon2_config
+    for key in ("profile", "time_cost", "memory_cost", "parallelism")
+)
+
+password_hasher = get_password_hasher(_argon2_config)
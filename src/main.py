@@ -16,7 +16,7 @@ from contextlib import asynccontextmanager
 
 from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import not_, or_, text
+from sqlalchemy import not_, select, text
 from sqlalchemy.exc import ProgrammingError
 from starlette.middleware.sessions import SessionMiddleware
 
@@ -34,7 +34,7 @@ from auth import google as google_auth
 from auth import local as local_auth
 from config import config
 from datastores.sql.crud.group import (
-    add_user_to_group,
+    add_users_to_group,
     create_group_in_db,
     get_group_by_name_from_db,
 )
@@ -52,20 +52,13 @@ async def populate_everyone_group(db):
         everyone_group = create_group_in_db(db, schemas.GroupCreate(name="Everyone"))
 
     # Add users that are not in the "Everyone" group.
-    users_to_add = (
-        db.query(User)
-        .filter(
-            or_(
-                not_(User.groups.any()),  # Users with no groups
-                not_(
-                    User.groups.any(Group.id == everyone_group.id)
-                ),  # Users not in everyone_group
-            )
+    users_to_add = db.scalars(
+        select(User.id).where(
+            not_(User.groups.any(Group.id == everyone_group.id)),
+            User.is_deleted.is_not(True),
         )
-        .all()
-    )
-    for user in users_to_add:
-        add_user_to_group(db, everyone_group, user)
+    ).all()
+    add_users_to_group(db, everyone_group, users_to_add)
 
 
 @asynccontextmanager
@@ -95,6 +88,7 @@ api_v1 = FastAPI()
 # Mount the API app
 app.mount("/api/v1", api_v1)
 
+# CORS is handled once here for all routes, including the mounted API app.
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -103,14 +97,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-api_v1.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
 # Authentication providers
 app.include_router(common_auth.router)
 app.include_router(local_auth.router)
@@ -15,6 +15,7 @@
 import base64
 import json
 import os
+import random
 import time
 import uuid
 
@@ -25,16 +26,31 @@ from celery.result import AsyncResult
 from datastores.sql import database
 from datastores.sql.models import file, folder, user, workflow
 
-from datastores.sql.crud.file import create_file_in_db, create_file_report_in_db
+from datastores.sql.crud.file import create_file_report_in_db, create_files_in_db
 from datastores.sql.crud.workflow import get_task_by_uuid_from_db, get_workflow_from_db
 
 from api.v1 import schemas
 
-from lib.file_hashes import generate_hashes
+from lib.file_hashes import generate_hashes_in_background
 
-# Number of times to retry database lookups
-MAX_DATABASE_LOOKUP_RETRIES = 10
-DATABASE_LOOKUP_RETRY_DELAY_SECONDS = 1
+# Database lookups are retried with exponential backoff, starting at
+# DATABASE_LOOKUP_INITIAL_DELAY_SECONDS and doubling up to
+# DATABASE_LOOKUP_MAX_DELAY_SECONDS, for at most DATABASE_LOOKUP_TIMEOUT_SECONDS.
+DATABASE_LOOKUP_INITIAL_DELAY_SECONDS = 0.05
+DATABASE_LOOKUP_MAX_DELAY_SECONDS = 1.0
+DATABASE_LOOKUP_TIMEOUT_SECONDS = 10
+
+# Celery task events that update the task state in the database.
+TASK_EVENT_TYPES = (
+    "task-sent",
+    "task-received",
+    "task-started",
+    "task-succeeded",
+    "task-failed",
+    "task-rejected",
+    "task-revoked",
+    "task-retried",
+)
 
 
 def get_task_from_db(db, task_uuid):
@@ -47,16 +63,18 @@ def get_task_from_db(db, task_uuid):
     Returns:
         The task object if found, otherwise None.
     """
-    task = None
-    for retry_count in range(MAX_DATABASE_LOOKUP_RETRIES):
+    delay = DATABASE_LOOKUP_INITIAL_DELAY_SECONDS
+    deadline = time.monotonic() + DATABASE_LOOKUP_TIMEOUT_SECONDS
+    retry_count = 0
+    while True:
         task = get_task_by_uuid_from_db(db, task_uuid)
-        if task:
+        if task or time.monotonic() + delay > deadline:
             break
-        print(
-            f"Database lookup for task {task_uuid} failed, "
-            f"retrying..{retry_count + 1}"
-        )
-        time.sleep(DATABASE_LOOKUP_RETRY_DELAY_SECONDS)
+        retry_count += 1
+        print(f"Database lookup for task {task_uuid} failed, retrying..{retry_count}")
+        # Add jitter so concurrent lookups don't retry in lockstep.
+        time.sleep(delay * random.uniform(0.5, 1.0))
+        delay = min(delay * 2, DATABASE_LOOKUP_MAX_DELAY_SECONDS)
     return task
 
 
@@ -98,17 +116,22 @@ def process_successful_task(db, celery_task, db_task, celery_app):
         celery_app: The Celery application.
     """
     celery_task_result = AsyncResult(celery_task.uuid, app=celery_app).get()
-    result_dict = json.loads(
-        base64.b64decode(celery_task_result.encode("utf-8")).decode("utf-8")
-    )
-    db_task.result = json.dumps(result_dict)
+    # The decoded result is already JSON, store it as is.
+    result_json = base64.b64decode(celery_task_result).decode("utf-8")
+    db_task.result = result_json
+    result_dict = json.loads(result_json)
+    db_task.output_file_path = result_dict.get("output_file_path")
 
     output_files = result_dict.get("output_files", [])
     file_reports = result_dict.get("file_reports", [])
 
+    # The workflow, including folder and user, is the same for all output files.
+    if output_files:
+        workflow = get_workflow_from_db(db, result_dict.get("workflow_id"))
+
     # Create files from the resulting output files
+    new_files = []
     for file_data in output_files:
-        workflow = get_workflow_from_db(db, result_dict.get("workflow_id"))
         display_name = file_data.get("display_name")
         data_type = file_data.get("data_type")
         file_uuid = uuid.UUID(file_data.get("uuid"))
@@ -127,9 +150,12 @@ def process_successful_task(db, celery_task, db_task, celery_app):
             source_file_id=source_file_id,
             task_output_id=db_task.id,
         )
-        new_file_db = create_file_in_db(db, new_file, workflow.user)
-        # TODO: Move this to a celery task to run in the background
-        generate_hashes(new_file_db.id)
+        new_files.append(new_file)
+
+    # Insert all output files in one batch and hash them in the background.
+    if new_files:
+        for file_id in create_files_in_db(db, new_files, workflow.user):
+            generate_hashes_in_background(file_id)
 
     for file_report in file_reports:
         new_file_report = schemas.FileReportCreate(
@@ -193,23 +219,22 @@ def monitor_celery_tasks(celery_app, db):
     state = celery_app.events.State()
 
     def on_worker_event(event):
-        if event.get("type") == "worker-heartbeat":
-            return
         print("Event.type", event.get("type"))
 
+    def on_task_event(event):
+        process_task_event(db, state, event, celery_app)
+
+    # Only subscribe to the events we act on. Events without a handler, such as the
+    # frequent worker heartbeats, are dropped by the receiver.
+    handlers = {
+        "worker-online": on_worker_event,
+        "worker-offline": on_worker_event,
+        "task-progress": lambda event: process_task_progress_event(db, state, event),
+    }
+    handlers.update({event_type: on_task_event for event_type in TASK_EVENT_TYPES})
+
     with celery_app.connection() as connection:
-        recv = celery_app.events.Receiver(
-            connection,
-            handlers={
-                "worker-heartbeat": on_worker_event,
-                "worker-online": on_worker_event,
-                "worker-offline": on_worker_event,
-                "task-progress": lambda event: process_task_progress_event(
-                    db, state, event
-                ),
-                "*": lambda event: process_task_event(db, state, event, celery_app),
-            },
-        )
+        recv = celery_app.events.Receiver(connection, handlers=handlers)
         recv.capture(limit=None, timeout=None, wakeup=True)
 
 